@@ -3,8 +3,15 @@
 ''' Module permettant de tester systmatiquement une srie de solveurs 
 pour le problme du voyageur de commerce.
 
-Permet de lancer automatiquement une srie de solveurs sur une srie de problmes
-et gnre une grille de rsultats au format CSV.
+Permet de lancer automatiquement une srie de solveurs sur une srie de problmes,
+avec plusieurs graines par test, en parallle sur un pool de processus (chacun
+attach  un processeur). Gnre une grille de rsultats au format CSV
+(moyenne, mdiane, meilleure longueur, cart  la rfrence, temps pour
+atteindre la cible, cart  la borne infrieure donne par le solveur) et,
+si demand, le dtail de toutes les excutions en JSON/CSV.
+
+Usage: PVC-tester.py [-m MODULE ...] [-t FICHIER:MAXTIME ...] [--seeds N] [-j PROCESSUS]
+                     [--reference FICHIER.json] [--target-gap ECART] [--json FICHIER] [--csv FICHIER]
 
 v0.2, Matthieu Amiguet, HE-Arc
 v0.3, hatem Ghorbel, HE-Arc
@@ -12,7 +19,7 @@ v0.3, hatem Ghorbel, HE-Arc
 
 # PARAMETRES
 # =========
-# modifier cette partie pour l'adapter  vos besoins
+# valeurs par dfaut, modifiables aussi depuis la ligne de commande
 
 # Le nom des modules  tester
 # Ces modules doivent tre dans le PYTHONPATH; p.ex. dans le rpertoire courant
@@ -36,9 +43,15 @@ tests = (
     #~ ('data/pb100.txt',90),
 )
 
+# Nombre de graines (excutions) par couple (module, test)
+seeds = 5
+
 # On tolre un dpassement de 5% du temps imparti:
 tolerance = 0.05
 
+# La cible d'un test est la longueur de rfrence plus cet cart relatif
+target_gap = 0.05
+
 # Fichier dans lequel crire les rsultats
 import sys
 
@@ -57,14 +70,22 @@ gui = False
 # Cette partie n'a thoriquement pas  tre modifie
 
 import os
+import csv
+import json
+import random
+import inspect
+import argparse
+import importlib
+import statistics
+import multiprocessing
 from time import time
-from math import hypot
 
+import instances
+import validation
 
-def dist(c1, c2):
-    x1, y1 = c1[0], c1[1]
-    x2, y2 = c2[0], c2[1]
-    return hypot(x2 - x1, y2 - y1)
+
+# Instances dj lues par la validation, par nom de fichier
+loaded_instances = {}
 
 
 def validate(filename, length, path, duration, maxtime):
@@ -74,80 +95,190 @@ def validate(filename, length, path, duration, maxtime):
     '''
     error = ""
 
-    print(filename)
-
     if duration > maxtime * (1 + tolerance):
         error += "Timeout (%.2f) " % (duration - maxtime)
     try:
-        cities = dict([(name, (int(x), int(y))) for name, x, y in [l.split() for l in open(filename, 'r')]])
+        if filename not in loaded_instances:
+            loaded_instances[filename] = instances.load(filename)
     except:
         return "(Validation failed...)"
-    tovisit = list(cities.keys())
 
     try:
-        totaldist = 0
-        for (ci, cj) in zip(path, path[1:] + path[0:1]):
-            totaldist += dist(cities[ci], cities[cj])
-            tovisit.remove(ci)
-
-        if int(totaldist) != int(length):
-            error += "Wrong dist! (%d instead of %d)" % (length, totaldist)
-    except KeyError:
-        error += "City %s does not exist! " % ci
-    except ValueError:
-        error += "City %s appears twice in %r! " % (ci, path)
+        error += validation.validate_path(loaded_instances[filename], length, path)
     except Exception as e:
         error += "Error during validation: %r" % e
 
-    if tovisit:
-        error += "Not all cities visited! %r" % tovisit
-
     return error
 
 
-if __name__ == '__main__':
-    # Rcupration des diffrentes implmentations
-    # On met les diffrentes fonctions ga_solve() dans un dictionnaire index par le nom du module correpsondant
-    # On en profite pour crire la ligne d'en-tte du fichier de sortie
+def pin_worker(cpus):
+    '''Initialisation d'un processus du pool: l'attache  un processeur libre (si le systme le permet),
+    sur lequel s'excuteront toutes ses excutions'''
+    cpu = cpus.get()
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
 
-    solvers = {}
 
+def run_case(case):
+    '''Excute un solveur sur un test avec une graine, et retourne le rsultat valid sous forme de dictionnaire'''
+    module, filename, maxtime, seed = case
+    result = {'module': module, 'file': filename, 'maxtime': maxtime, 'seed': seed,
+              'length': None, 'duration': None, 'error': '', 'trace': None, 'bound_gap': None}
+    # Les solveurs qui n'acceptent pas de graine utilisent les gnrateurs globaux
+    random.seed(seed)
+    try:
+        import numpy
+        numpy.random.seed(seed)
+    except ImportError:
+        pass
+    try:
+        solver = importlib.import_module(module)
+        kwargs = {'seed': seed} if 'seed' in inspect.signature(solver.ga_solve).parameters else {}
+        start = time()
+        if hasattr(solver, 'solve_iter'):
+            # Les solveurs qui le permettent donnent chaque amlioration: (temps coul, longueur)
+            result['trace'] = []
+            for improvement in solver.solve_iter(filename, gui, maxtime, **kwargs):
+                result['trace'].append((time() - start, improvement.length))
+            length, path = improvement.length, improvement.tour
+            # cart  la borne infrieure, si le solveur la calcule
+            result['bound_gap'] = getattr(improvement, 'gap', None)
+        else:
+            length, path = solver.ga_solve(filename, gui, maxtime, **kwargs)
+        result['duration'] = time() - start
+    except Exception as e:
+        result['error'] = "%r" % e
+    except SystemExit:
+        result['error'] = "tried to quit!"
+    else:
+        result['length'] = length
+        result['error'] = validate(filename, length, path, result['duration'], maxtime)
+    if verbose:
+        print("## %s %s (%ds) seed %d: %s" % (module, filename, maxtime, seed, result['error'] or result['length']))
+    return result
+
+
+def run_all(cases, jobs):
+    '''Excute tous les cas sur un pool de processus, chacun attach  un processeur diffrent
+    (dans ce processus avec l'interface graphique)'''
+    if gui:
+        # Le solveur dessine depuis son propre processus, que les processus du pool (dmons) ne peuvent pas crer:
+        # les cas sont excuts l'un aprs l'autre dans ce processus
+        return [run_case(case) for case in cases]
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    jobs = jobs or max(1, len(available) or os.cpu_count() or 1)
+    cpus = multiprocessing.Queue()
+    for i in range(jobs):
+        cpus.put(available[i] if i < len(available) else None)
+    with multiprocessing.Pool(jobs, initializer=pin_worker, initargs=(cpus,)) as pool:
+        return list(pool.imap_unordered(run_case, cases))
+
+
+def summarize(runs, references):
+    '''Calcule les statistiques de chaque couple (module, test)
+
+    L'cart est relatif  la longueur de rfrence du fichier si elle est connue,  la meilleure longueur
+    trouve sur le fichier par toutes les excutions sinon. Le temps pour atteindre la cible est le temps
+    moyen de la premire amlioration  moins de target_gap de la rfrence, parmi les excutions qui l'atteignent
+    (leur dure totale si le solveur ne donne pas ses amliorations). L'cart  la borne est la moyenne des carts
+     la borne infrieure donns par le solveur.
+    '''
+    best_found = {}
+    for r in runs:
+        if not r['error']:
+            best_found[r['file']] = min(best_found.get(r['file'], r['length']), r['length'])
+
+    summary = []
+    for key in sorted({(r['module'], r['file'], r['maxtime']) for r in runs}):
+        module, filename, maxtime = key
+        group = [r for r in runs if (r['module'], r['file'], r['maxtime']) == key]
+        valid = [r for r in group if not r['error']]
+        lengths = [r['length'] for r in valid]
+        reference = references.get(filename, best_found.get(filename))
+        row = {'module': module, 'file': filename, 'maxtime': maxtime, 'runs': len(group), 'valid': len(valid),
+               'mean': None, 'median': None, 'best': None, 'reference': reference, 'gap': None,
+               'target_hits': 0, 'time_to_target': None, 'bound_gap': None,
+               'errors': sorted({r['error'] for r in group if r['error']})}
+        if lengths:
+            row['mean'] = statistics.mean(lengths)
+            row['median'] = statistics.median(lengths)
+            row['best'] = min(lengths)
+            target = reference * (1 + target_gap)
+            hits = [r['duration'] if r['trace'] is None else min(t for t, length in r['trace'] if length <= target)
+                    for r in valid if r['length'] <= target]
+            row['gap'] = row['mean'] / reference - 1 if reference else None
+            row['target_hits'] = len(hits)
+            row['time_to_target'] = statistics.mean(hits) if hits else None
+            bound_gaps = [r['bound_gap'] for r in valid if r['bound_gap'] is not None]
+            row['bound_gap'] = statistics.mean(bound_gaps) if bound_gaps else None
+        summary.append(row)
+    return summary
+
+
+def write_grid(summary):
+    '''crit la grille de rsultats (une ligne par test, une colonne par module) dans outfile'''
+    columns = sorted({row['module'] for row in summary}, key=lambda m: list(modules).index(m) if m in modules else 0)
     outfile.write('Test;')
-
-    for m in modules:
-        exec("from %s import ga_solve" % m)
-        solvers[m] = ga_solve
+    for m in columns:
         outfile.write("%s;" % m)
-
     outfile.write('\n')
-
-    # Cette partie effectue les tests proprement dits
-    # et rapporte les rsultats dans outfile
-
-    for (filename, maxtime) in tests:
-        if verbose:
-            print("--> %s, %d" % (filename, maxtime))
-            # normalisation du nom de fichier (pour l'aspect multi-plateforme)
-        filename = os.path.normcase(os.path.normpath(filename))
-        # criture de l'en-tte de ligne
-        outfile.write("%s (%ds);" % (filename, maxtime))
-        # Appel des solveurs proprement dits, vrification et criture des rsultats
-        for m in modules:
-            if verbose:
-                print("## %s" % m)
-            try:
-                start = time()
-                length, path = solvers[m](filename, gui, maxtime)
-                duration = time() - start
-            except Exception as e:
-                outfile.write("%r;" % e)
-            except SystemExit:
-                outfile.write("tried to quit!;")
+    for test in sorted({(row['file'], row['maxtime']) for row in summary}):
+        outfile.write("%s (%ds);" % test)
+        for m in columns:
+            row = [r for r in summary if (r['file'], r['maxtime']) == test and r['module'] == m][0]
+            if row['valid']:
+                gap = "" if row['gap'] is None else " gap %.2f%%" % (100 * row['gap'])
+                if row['bound_gap'] is not None:
+                    gap += " bound gap %.2f%%" % (100 * row['bound_gap'])
+                outfile.write("mean %d median %d best %d%s (%d/%d);" % (row['mean'], row['median'], row['best'], gap,
+                                                                       row['valid'], row['runs']))
             else:
-                error = validate(filename, length, path, duration, maxtime)
-                if not error:
-                    outfile.write("%d;" % length)
-                else:
-                    outfile.write("%s;" % error)
-            outfile.flush()
-        outfile.write('\n')
\ No newline at end of file
+                outfile.write("%s;" % " ".join(row['errors']))
+        outfile.write('\n')
+    outfile.flush()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Banc de test des solveurs du voyageur de commerce')
+    parser.add_argument('-m', '--module', action='append', help='module  tester (dfaut: %s)' % ', '.join(modules))
+    parser.add_argument('-t', '--test', action='append', help='test sous la forme fichier:maxtime')
+    parser.add_argument('--seeds', type=int, default=seeds, help='nombre de graines par test')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='nombre de processus (dfaut: un par processeur)')
+    parser.add_argument('--reference', help='fichier JSON des longueurs de rfrence (optimales) par fichier')
+    parser.add_argument('--target-gap', type=float, default=target_gap, help='cart relatif de la cible')
+    parser.add_argument('--json', help='fichier JSON pour le dtail des excutions et les statistiques')
+    parser.add_argument('--csv', help='fichier CSV pour le dtail des excutions')
+    parser.add_argument('--gui', action='store_true', default=gui)
+    parser.add_argument('-v', '--verbose', action='store_true', default=verbose)
+    args = parser.parse_args()
+
+    modules = tuple(args.module or modules)
+    if args.test:
+        tests = tuple((t.rsplit(':', 1)[0], int(t.rsplit(':', 1)[1])) for t in args.test)
+    target_gap = args.target_gap
+    gui = args.gui
+    verbose = args.verbose
+
+    references = {}
+    if args.reference:
+        with open(args.reference) as f:
+            references = {os.path.normcase(os.path.normpath(k)): v for k, v in json.load(f).items()}
+
+    # normalisation du nom de fichier (pour l'aspect multi-plateforme)
+    cases = [(m, os.path.normcase(os.path.normpath(filename)), maxtime, seed)
+             for (filename, maxtime) in tests for m in modules for seed in range(args.seeds)]
+    runs = run_all(cases, args.jobs)
+    runs.sort(key=lambda r: (r['file'], r['maxtime'], r['module'], r['seed']))
+    summary = summarize(runs, references)
+
+    write_grid(summary)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': runs, 'summary': summary}, f, indent=2)
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['module', 'file', 'maxtime', 'seed', 'length', 'duration',
+                                                'bound_gap', 'error'],
+                                    extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(runs)
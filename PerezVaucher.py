@@ -24,217 +24,812 @@
         en inversant le chemin entre eux aussi.
     4. Test si une meilleure solution existe dans la nouvelle population et reprise au point 1.
 """
-import pygame
+import collections
 import math
+import os
 import random
+import numpy as np
 import sys
 import time
-from pygame.locals import KEYDOWN, QUIT, MOUSEBUTTONDOWN, K_RETURN
-
-# GUI
-screen = None
-city_color = (10, 10, 200)  # blue
-summary_color = (255, 255, 255)  # white
-city_font_size = 16  # pixels
-summary_font_size = 26  # pixels
-screen_size = (500, 500)
-city_radius = 2
-city_font = None
-summary_font = None
-
-cities = []
+import multiprocessing
+import queue
+
+import adaptive
+import checkpoint
+import construction
+import decomposition
+import exact
+import instances
+import localsearch
+import lowerbound
+import profiling
+import recombination
+import resultcache
+import validation
+
+# Renderer process showing the solutions published by the solver (None without GUI)
+renderer = None
+
+# Cities of the problem: their names and coordinates (instances.Instance)
+cities = None
+# Coordinates of the cities as a N x 2 float array, indexed like cities
+coordinates = None
+# Precomputed N x N matrix of the distances between cities (None when there are too many cities)
+distances = None
+# From this quantity of cities, the distance matrix is stored in float32 to halve its memory
+distance_matrix_float32_from = 4000
+# Above this quantity of cities, no matrix is built and distances are computed from the coordinates
+distance_matrix_max_cities = 10000
+# Distances computed at once (by blocks of rows) when the matrix is built, to bound its temporary arrays
+distance_matrix_block_cells = 2 ** 22
+# Nearest neighbours of each city, for the local search
+neighbours = None
 # Population size in percent of the number of cities, here 1000%
 population_size_percent = 1000 / 100
 # Quantity of elites for the selection, here 30% of the population
 elitism_percent = 30 / 100
+# Selection method: 'SENGOKU', 'elites', 'tournament' or 'unique'
+selection_method = 'SENGOKU'
+# Crossover operator: 'two_points' (order crossover), 'erx' (edge recombination) or 'eax' (edge assembly)
+crossover_method = 'eax'
+# Edge assembly crossover: children made from each pair of parents, each with another AB-cycle
+eax_children_per_pair = 10
 # Quantity of solutions that will be mutated, here 20% of the population
 mutation_percent = 20 / 100
+# Mutation method: '2opt', 'swap' or 'reverse'
+mutation_method = '2opt'
+# Choose the selection and mutation methods at each generation, and adapt the mutation rate and the population size
+# when the best solution stagnates (see adaptive)
+adaptive_control = False
+# File where the schedule of the adaptive control is written at the end of a run (None to not write it)
+adaptive_log = None
 # Size of the tournament
 tournament_size = 15
 # Number of worse solutions than the current one required to stop the generation
 gen_without_better_solution_limit = 50
 # Mutation tentatives to try
 limit_mutation_try = 10
+# Share of the initial population built with constructive heuristics, the others being random tours
+seeded_percent = 2 / 100
+# Constructive heuristics used in turn for the seeded solutions: 'nearest', 'greedy', 'hilbert' and/or 'insertion'
+seeding_strategies = ('nearest', 'greedy', 'hilbert', 'insertion')
+# Quantity of elites improved by the local search at each generation (0 to disable)
+local_search_elites = 2
+# Improve the best solution found with the local search before returning it
+local_search_result = True
+# Share of maxtime kept for the local search of the best solution
+local_search_time_share = 5 / 100
+# Island mode: generations between two migrations
+migration_interval = 10
+# Island mode: quantity of best solutions sent to each neighbour island at every migration
+migration_size = 3
+# Solve the small instances exactly (see exact), up to exact.branch_and_bound_max_cities cities
+exact_solvers = True
+# From this quantity of cities, the instance is decomposed in clusters solved separately (see decomposition).
+# None to decompose only when asked: within a time budget, the stitched tour is still longer than the greedy tour
+# improved by the local search
+decomposition_min_cities = None
+# Decomposition mode: share of maxtime by which the clusters are solved, the rest is for stitching and the local search
+decomposition_time_share = 80 / 100
+# Compute a lower bound alongside every solve (see lowerbound), for the gap reported with the improvements.
+# Otherwise it is only computed for a target gap: it competes with the solver for the processor
+compute_lower_bound = False
+# Seconds between two checkpoints of the genetic algorithm
+checkpoint_interval = 60
+# Debug mode: check every incrementally updated score against a full evaluation
+check_delta_fitness = False
+# Buffer used by reverse to copy paths
+reverse_buffer = None
+# Random generator for the vectorized operations on the population
+rng = np.random.default_rng()
 
 
 def cities_from_file(file):
     """
-    Load cities from the file given
-    """
-    f = open(file, 'r')
-    cities.clear()
-    for line in f:
-        comp = line.rstrip('\n').split(' ')
-        city = (comp[0], (int(comp[1]), int(comp[2])))
-        cities.append(city)
-
-    return cities
-
-
-def draw_cities(positions, connected=False, generation=-1, distance=-1):
-    """Draw the cities passed in argument to the GUI"""
-    # GUI mode selected
-    if screen is not None:
-        screen.fill(0)
-        for pos in positions:
-            text = city_font.render(pos[0], True, city_color, (0, 0, 0))
-            textrect = text.get_rect()
-            textrect.centerx = pos[1][0]
-            textrect.centery = pos[1][1]
-            screen.blit(text, textrect)
-
-        if connected:
-            pygame.draw.lines(screen, city_color, True, [x[1] for x in positions])
-
-        if generation != -1 and distance != -1:
-            text = city_font.render('Generation n°' + str(generation) + '; Distance = ' + str(round(distance, 2)), True,
-                                    summary_color, (0, 0, 0))
-            textrect = text.get_rect()
-            textrect.centerx = screen_size[0] / 2.0
-            textrect.centery = screen_size[1] - summary_font_size / 4.0
-            screen.blit(text, textrect)
-
-        pygame.display.flip()
-
-
-def setup_gui():
-    """Initialize the GUI"""
-    global screen, city_font, summary_font
-    pygame.init()
-    city_font = pygame.font.SysFont(None, city_font_size)
-    summary_font = pygame.font.SysFont(None, summary_font_size)
-    pygame.display.set_mode(screen_size)
-    pygame.display.set_caption('TSP by Alexandre Perez and Sébastien Vaucher')
-    screen = pygame.display.get_surface()
-
-
-def cities_by_mouse():
-    """Ask the user to set the locations of cities with his mouse"""
-    global screen
-    was_gui = True
-    # Check if we are in nogui mode, in which case the window must be created
-    # then destroyed at the end of the procedure
-    if screen is None:
-        was_gui = False
-        setup_gui()
-
-    collecting = True
-    i = 0
-    while collecting:
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                sys.exit(0)
-            elif event.type == KEYDOWN and event.key == K_RETURN:
-                collecting = False
-            elif event.type == MOUSEBUTTONDOWN:
-                city = ('v' + str(i), pygame.mouse.get_pos())
-                i += 1
-                cities.append(city)
-                draw_cities(cities)
-
-    if not was_gui:
-        pygame.quit()
-        screen = None
-
-
-def ga_solve(file=None, gui=True, maxtime=0):
-    global cities
-    t1 = time.time()
+    Load cities from the file given (see instances.load for the formats)
+    """
+    return instances.load(file)
 
-    if gui:
-        setup_gui()
 
-    if file is not None:
+def show(tour=None, connected=False, generation=-1, distance=-1):
+    """Publish the tour to the renderer, if there is a GUI (same parameters as display.draw_cities)"""
+    if renderer is not None:
+        renderer.publish(tour, connected, generation, distance)
+
+
+# Improvement of the best solution reported by solve_iter:
+# generation number (-1 after the end of the genetic algorithm), total distance, elapsed seconds, names of the tour
+# and relative gap to the lower bound (None while it is unknown)
+Improvement = collections.namedtuple('Improvement', ['generation', 'length', 'elapsed', 'tour', 'gap'],
+                                     defaults=[None])
+
+
+class Control:
+    """
+    Control of a running solver, which can be changed while it runs (from another thread or between two improvements):
+    maxtime is the time budget in seconds since the start (0 to stop when no better solution is found
+    during gen_without_better_solution_limit generations), and cancel() stops it at the next generation.
+    With a target_gap, the genetic algorithm also stops once the best length is within that share of the lower bound
+    computed by bounding (a lowerbound.Bounding).
+    In island mode, the islands keep the maxtime they were started with (a target gap is refused, see ga_solve).
+    With adaptive_control, controller is the adaptive.Controller of the genetic algorithm once it is started.
+    """
+
+    def __init__(self, maxtime=0, target_gap=None):
+        self.maxtime = maxtime
+        self.cancelled = False
+        self.target_gap = target_gap
+        self.bounding = None
+        self.controller = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def extend(self, seconds):
+        self.maxtime += seconds
+
+    def gap(self, length):
+        """
+        Return the relative gap between the length and the lower bound, or None while it is unknown
+        """
+        bound = self.bounding.poll() if self.bounding is not None else None
+        if not bound:
+            return None
+        return max(length / bound - 1, 0.0)
+
+    def reached(self, length):
+        """
+        Return True if the length is within the target gap of the lower bound
+        """
+        if self.target_gap is None:
+            return False
+        gap = self.gap(length)
+        return gap is not None and gap <= self.target_gap
+
+
+class SolverState:
+    """
+    State of the solver for one instance: the module globals holding the instance and the random generators.
+    swap() exchanges it with the globals, so that a solve runs with its own state in the globals while another one
+    is paused (see solve_iter). A new state has no instance and random generators seeded with the seed if given.
+    """
+
+    names = ('cities', 'coordinates', 'distances', 'neighbours', 'rng', 'renderer')
+
+    def __init__(self, seed=None):
+        self.values = {'cities': None, 'coordinates': None, 'distances': None, 'neighbours': None,
+                       'rng': np.random.default_rng(seed), 'renderer': None}
+        self.random_state = random.Random(seed).getstate()
+
+    def swap(self):
+        """
+        Exchange the state with the globals of the module and the state of the random module
+        """
+        module = globals()
+        for name in self.names:
+            module[name], self.values[name] = self.values[name], module[name]
+        python_random = random.getstate()
+        random.setstate(self.random_state)
+        self.random_state = python_random
+
+
+def ga_solve(file=None, gui=True, maxtime=0, islands=1, topology='ring', interval=None, seed=None,
+             checkpoint_file=None, resume=False, warm_start=None, result_cache=None, decompose=None, target_gap=None):
+    """
+    Solve the travelling salesman problem for the cities of the file or instances.Instance (or placed with the mouse).
+    With islands > 1, the population is split between that many processes which exchange their best
+    solutions every interval generations, along the given topology ('ring' or 'complete').
+    If a seed is given, the random generators are initialized with it.
+    Without islands:
+    - if a checkpoint_file is given, the state of the genetic algorithm is saved in it every checkpoint_interval
+      seconds and at the end, and if resume is True and the file exists, the run continues from it.
+    - if a warm_start file is given (a checkpoint, or a tour with the names of the cities), its tours are put in
+      the initial population.
+    If a result_cache directory is given, the best tour found is saved in it (see resultcache). When the same cities
+    were already solved with at least the same maxtime, the cached tour is returned at once, otherwise it is put in
+    the initial population (except with islands), after being repaired if a few cities were added or removed.
+    Instances of up to exact.branch_and_bound_max_cities cities are solved exactly (if exact_solvers is True),
+    and the optimal tour is returned at once (unless the branch and bound is stopped by its deadline).
+    If decompose is True (by default, if decomposition_min_cities is set and reached), the instance is solved
+    by clusters (see solve_decomposed), on islands processes if islands > 1, one per processor otherwise.
+    If compute_lower_bound is True or a target_gap is given, a lower bound is computed alongside (see lowerbound),
+    and the genetic algorithm stops as soon as the best length is within target_gap (0.01 for 1%) of it.
+    The islands don't check the lower bound: a target_gap with islands > 1 raises a ValueError.
+    Return the total distance and the names of the cities of the best tour found (solve_iter also gives the gap).
+    """
+    best = None
+    for best in solve_iter(file, gui, maxtime, islands, topology, interval, seed, checkpoint_file, resume, warm_start,
+                           result_cache, decompose, target_gap):
+        pass
+    return best.length, best.tour
+
+
+def solve_iter(file=None, gui=True, maxtime=0, islands=1, topology='ring', interval=None, seed=None,
+               checkpoint_file=None, resume=False, warm_start=None, result_cache=None, decompose=None, target_gap=None,
+               control=None, state=None):
+    """
+    Generator version of ga_solve (same parameters), yielding an Improvement each time a better solution is found,
+    and once more at the end if the lower bound was found after the last one.
+    The run can be stopped or its budget changed through the given Control (which replaces maxtime and target_gap),
+    or stopped by closing the generator.
+    The solve runs with its own SolverState (a new one if none is given), which is in the module globals only while
+    the generator runs: several solves can be interleaved in the same thread, and the globals are left unchanged.
+    """
+    if state is None:
+        state = SolverState()
+    steps = solve_steps(file, gui, maxtime, islands, topology, interval, seed, checkpoint_file, resume, warm_start,
+                        result_cache, decompose, target_gap, control)
+    while True:
+        state.swap()
+        try:
+            improvement = next(steps)
+        except StopIteration:
+            return
+        finally:
+            state.swap()
+        try:
+            yield improvement
+        except GeneratorExit:
+            state.swap()
+            try:
+                steps.close()
+            finally:
+                state.swap()
+            raise
+
+
+def solve_steps(file, gui, maxtime, islands, topology, interval, seed, checkpoint_file, resume, warm_start,
+                result_cache, decompose, target_gap, control):
+    """
+    Solve with the state in the module globals, yielding the improvements (see solve_iter)
+    """
+    global cities, neighbours, rng, renderer
+    t1 = time.time()
+    if control is None:
+        control = Control(maxtime, target_gap)
+    if profiling.enabled:
+        profiling.reset()
+
+    if seed is not None:
+        random.seed(seed)
+        rng = np.random.default_rng(seed)
+
+    if isinstance(file, instances.Instance):
+        cities = file
+    elif file is not None:
         cities = cities_from_file(file)
     else:
-        cities_by_mouse()
-
-    draw_cities(cities)
+        import display
+        cities = display.cities_by_mouse()
+
+    if decompose is None:
+        decompose = decomposition_min_cities is not None and len(cities) >= decomposition_min_cities
+    # If the number of cities is less than 7, there is no crossover to spread between islands
+    island_mode = islands > 1 and not decompose and len(cities) > 6
+    if island_mode and control.target_gap is not None:
+        raise ValueError('the islands do not check the target gap')
+    # The clusters have their own distance matrices
+    build_distances(cities, matrix=not decompose)
+    # The result cache and the lower bound use the neighbour lists, even when the solver doesn't
+    if neighbours is None and (result_cache is not None or compute_lower_bound or control.target_gap is not None):
+        neighbours = localsearch.neighbour_lists(coordinates)
+    if gui:
+        # pygame is only imported with a GUI, so that headless runs and their worker processes start faster
+        import display
+        renderer = display.Renderer(cities)
+
+    def improvement(generation, tour, length, gap=None):
+        if gap is None:
+            gap = control.gap(length)
+        return Improvement(generation, float(length), time.time() - t1, cities.tour_names(tour), gap)
+
+    try:
+        population_size = int(len(cities) * population_size_percent)
+        time_share = 1 - local_search_time_share if local_search_result else 1
+
+        cached = None
+        if result_cache is not None:
+            cached = resultcache.lookup(result_cache, coordinates, neighbours)
+        # The cached tour is returned at once if it was found with at least the same budget
+        hit = cached is not None and cached.covers(control.maxtime)
+        # Small instances are solved exactly. If the branch and bound is stopped by its deadline,
+        # the genetic algorithm starts from its best tour.
+        exact_tour, optimal = None, False
+        if exact_solvers and not hit and not decompose and len(cities) <= exact.branch_and_bound_max_cities:
+            exact_tour, optimal = exact.solve(coordinates,
+                                              t1 + control.maxtime * time_share / 2 if control.maxtime else None)
+        if (compute_lower_bound or control.target_gap is not None) and not hit and not optimal and \
+                len(cities) <= lowerbound.exact_tree_max_cities:
+            control.bounding = lowerbound.Bounding(coordinates, neighbours)
+        last = None
+        if hit:
+            fittest = [cached.tour, cached.length]
+            last = improvement(-1, fittest[0], fittest[1])
+            yield last
+        elif optimal:
+            fittest = [exact_tour, total_distance(exact_tour)]
+            last = improvement(-1, fittest[0], fittest[1], 0.0)
+            yield last
+        elif decompose:
+            fittest = solve_decomposed(t1, control.maxtime, islands if islands > 1 else 0)
+            last = improvement(-1, fittest[0], fittest[1])
+            yield last
+        elif island_mode:
+            fittest = solve_islands(t1, control.maxtime * time_share, islands, topology,
+                                    migration_interval if interval is None else interval)
+            last = improvement(-1, fittest[0], total_distance(fittest[0]))
+            yield last
+        else:
+            resumed = None
+            if checkpoint_file is not None and resume and os.path.exists(checkpoint_file):
+                population, gen, gen_without_better_solution, fittest, python_random, numpy_rng = \
+                    checkpoint.load(checkpoint_file, coordinates)
+                random.setstate(python_random)
+                rng.bit_generator.state = numpy_rng
+                resumed = (gen, gen_without_better_solution, fittest)
+                last = improvement(gen, fittest[0], total_distance(fittest[0]))
+                yield last
+            else:
+                population = initial_population(cities, population_size)
+                tours = [cached.tour[np.newaxis]] if cached is not None else []
+                if exact_tour is not None:
+                    tours.append(exact_tour[np.newaxis])
+                if warm_start is not None:
+                    tours.append(warm_start_tours(warm_start))
+                if tours:
+                    tours = np.concatenate(tours)[:population_size]
+                    population[0][:len(tours)] = tours
+                    population[1][:len(tours)] = population_distances(tours)
+            for gen, fittest in evolve_iter(population, t1, control, time_share, None, checkpoint_file, resumed):
+                last = improvement(gen, fittest[0], total_distance(fittest[0]))
+                yield last
+            if last is None:
+                # The budget ran out before the first generation: the best initial solution is kept
+                best = int(np.argmin(population[1]))
+                fittest = [population[0][best], population[1][best]]
+                last = improvement(0, fittest[0], fittest[1])
+                yield last
+
+        # The decomposition ends with its own local search
+        if local_search_result and not control.cancelled and not hit and not optimal and not decompose:
+            tour = localsearch.local_search(fittest[0], coordinates, neighbours,
+                                            deadline=t1 + control.maxtime if control.maxtime else None)
+            if total_distance(tour) < fittest[1]:
+                fittest = [tour, total_distance(tour)]
+                last = improvement(-1, fittest[0], fittest[1])
+                yield last
+        if last is not None and last.gap is None and control.gap(fittest[1]) is not None:
+            yield improvement(-1, fittest[0], fittest[1])
+        if adaptive_log is not None and control.controller is not None:
+            control.controller.export(adaptive_log)
+        if result_cache is not None and not hit:
+            # A cancelled run is cached with the time it was given, an optimal tour as if it had all the time
+            resultcache.store(result_cache, coordinates, fittest[0], float(fittest[1]),
+                              0 if optimal else time.time() - t1 if control.cancelled else control.maxtime)
+        show(fittest[0], True, -1, fittest[1])
+    finally:
+        if control.bounding is not None:
+            control.bounding.stop()
+            control.bounding = None
+        if renderer is not None:
+            renderer.close()
+            renderer = None
+
+
+def evolve(population, t1, maxtime, migration=None):
+    """
+    Run the genetic algorithm on the population until maxtime is elapsed since t1, or if maxtime is 0,
+    until no better solution is found during gen_without_better_solution_limit generations.
+    If given, migration(gen, population) is called on the sorted population at each generation
+    and returns the population to continue with.
+    Return the fittest solution.
+    """
+    fittest = None
+    for gen, fittest in evolve_iter(population, t1, Control(maxtime), 1, migration):
+        pass
+    return fittest
 
-    quantity_of_cities = len(cities)
-    population_size = quantity_of_cities * population_size_percent
 
-    # Initial population
-    population = initial_population(cities, population_size)
+def evolve_iter(population, t1, control, time_share=1, migration=None, checkpoint_file=None, resumed=None):
+    """
+    Generator version of evolve, yielding the generation number and the fittest solution each time it improves.
+    The stop criterion is read from the control at each generation (with its target gap), and only time_share of its
+    maxtime is used.
+    If a checkpoint_file is given, the state is saved in it every checkpoint_interval seconds and at the end.
+    resumed is the (generation, generations without better solution, fittest solution) to continue from.
+    With adaptive_control, the methods, the mutation rate and the population size are chosen by the controller,
+    which is put in the control.
+    """
+    quantity_of_cities = population[0].shape[1]
+    population_size = len(population[1])
+    selection_choice, mutation_choice, rate = selection_method, mutation_method, mutation_percent
+    controller = None
+    if adaptive_control:
+        controller = adaptive.Controller(('SENGOKU', 'elites', 'tournament', 'unique'), ('2opt', 'swap', 'reverse'),
+                                         mutation_percent, population_size)
+        control.controller = controller
+        elite_quantity = int(quantity_of_cities * elitism_percent)
+        elites_score = None
 
     gen = 0
     gen_without_better_solution = 0
     fittest = None
+    if resumed is not None:
+        gen, gen_without_better_solution, fittest = resumed
+    last_checkpoint = time.time()
 
-    while (maxtime == 0 and gen_without_better_solution < gen_without_better_solution_limit) or time.time() - t1 <= maxtime:
-        # Prevent GUI freezing
-        if screen is not None:
-            for event in pygame.event.get():
-                if event.type == QUIT:
-                    sys.exit(0)
+    while not control.cancelled and (fittest is None or not control.reached(fittest[1])) and \
+            ((control.maxtime == 0 and gen_without_better_solution < gen_without_better_solution_limit) or
+             time.time() - t1 <= control.maxtime * time_share):
+        # Stop if the window was closed
+        process_gui_events()
+        generation_cpu = time.process_time()
 
         # Evaluate
         # evaluate(population) No need to evaluate because score is always computed when new solution is done, just sort it
-        population.sort(key=lambda s: s[1])
+        with profiling.stage('sort'):
+            population = sort_population(population)
+        if profiling.enabled:
+            profiling.record_generation(gen, float(population[1][0]), float(population[1].mean()))
+        if controller is not None:
+            # Reward of the selection of the previous generation
+            score = float(population[1][:elite_quantity].mean())
+            if elites_score is not None:
+                controller.selection.reward(selection_choice, max(elites_score - score, 0) /
+                                            max(generation_seconds, 1e-6))
+            elites_score = score
         # Check the fittest
-        if fittest is None or fittest[1] > population[0][1]:
+        if fittest is None or fittest[1] > population[1][0]:
             gen_without_better_solution = 0
-            fittest = [population[0][0].copy(), population[0][1]]
+            fittest = [population[0][0].copy(), population[1][0]]
+            if controller is not None:
+                controller.improved()
+            yield gen, fittest
+        if controller is not None:
+            selection_choice, mutation_choice = controller.choose()
+            rate, population_size = controller.mutation_percent, controller.population_size
 
-        draw_cities(fittest[0], True, gen, fittest[1])
+        with profiling.stage('draw'):
+            show(fittest[0], True, gen, fittest[1])
+
+        if migration is not None:
+            with profiling.stage('migration'):
+                population = migration(gen, population)
 
         # If the number of cities is less than 7,
         # we don't make crossover. We just mutate on all the population
         if quantity_of_cities > 6:
             # Selection
-            elites = selection(population)
+            with profiling.stage('selection'):
+                elites = selection(population, selection_choice)
             # Crossover
-            children = crossover(elites, population_size - len(elites))
-            population = elites + children
+            with profiling.stage('crossover'):
+                children = crossover(elites, population_size - len(elites[1]),
+                                     t1 + control.maxtime * time_share if control.maxtime else None)
+                population = [np.concatenate((elites[0], children[0])), np.concatenate((elites[1], children[1]))]
+            # Memetic step
+            with profiling.stage('local_search'):
+                improve_elites(population, len(elites[1]),
+                               t1 + control.maxtime * time_share if control.maxtime else None)
 
         # Mutate
-        for i in range(0, int(len(population) * mutation_percent)):
-            mutate(population[random.randint(0, len(population) - 1)][0])
+        with profiling.stage('mutate'):
+            mutation_cpu = time.process_time()
+            mutated_score = population[1].sum()
+            for i in range(0, int(len(population[1]) * rate)):
+                mutate(population, random.randint(0, len(population[1]) - 1), mutation_choice)
+
+        if controller is not None:
+            cpu = time.process_time()
+            controller.mutation.reward(mutation_choice, max(mutated_score - population[1].sum(), 0) /
+                                       max(cpu - mutation_cpu, 1e-6))
+            generation_seconds = cpu - generation_cpu
+            event = controller.stagnation(gen_without_better_solution + 1)
+            if event == 'restart':
+                # The best solutions are kept, the others are new
+                population = sort_population(population)
+                survivors = [population[0][:adaptive.restart_survivors], population[1][:adaptive.restart_survivors]]
+                population = initial_population(cities, controller.population_size)
+                population[0][:len(survivors[1])] = survivors[0]
+                population[1][:len(survivors[1])] = survivors[1]
+                elites_score = None
+            controller.record(gen, time.time() - t1, selection_choice, mutation_choice, event, fittest[1])
         gen += 1
         gen_without_better_solution += 1
 
-    return total_distance(fittest[0]), [c[0] for c in fittest[0]]
+        if checkpoint_file is not None and time.time() - last_checkpoint >= checkpoint_interval:
+            with profiling.stage('checkpoint'):
+                checkpoint.save(checkpoint_file, coordinates, population, gen, gen_without_better_solution, fittest,
+                                random, rng)
+            last_checkpoint = time.time()
+
+    if checkpoint_file is not None and fittest is not None:
+        checkpoint.save(checkpoint_file, coordinates, population, gen, gen_without_better_solution, fittest, random, rng)
+
+
+def warm_start_tours(filename):
+    """
+    Return the tours of a checkpoint file (.npz), from the best one, or the tour of a file with the names of
+    the cities in its order, as a 2D array
+    """
+    if filename.endswith('.npz'):
+        population = sort_population(checkpoint.load(filename, coordinates)[0])
+        return population[0]
+    with open(filename, 'r') as f:
+        path = f.read().split()
+    error = validation.validate_path(cities, None, path)
+    if error:
+        raise ValueError('%s: %s' % (filename, error))
+    return np.array([[cities.index[name] for name in path]], dtype=np.intp)
+
+
+def improve_elites(population, elite_quantity, deadline=None):
+    """
+    Apply the local search on local_search_elites random solutions among the first elite_quantity ones
+    of the population, and update their scores
+    """
+    if profiling.enabled:
+        profiling.count('local_searches', min(local_search_elites, elite_quantity))
+    for i in rng.choice(elite_quantity, min(local_search_elites, elite_quantity), replace=False):
+        population[0][i] = localsearch.local_search(population[0][i], coordinates, neighbours, deadline=deadline)
+        population[1][i] = total_distance(population[0][i])
+
+
+def process_gui_events():
+    """
+    Exit if the window of the renderer was closed
+    """
+    if renderer is not None and renderer.closed.is_set():
+        sys.exit(0)
+
+
+def island_neighbours(island, islands, topology):
+    """
+    Return the islands receiving the migrants of the given island
+    """
+    if topology == 'ring':
+        return [(island + 1) % islands]
+    if topology == 'complete':
+        return [i for i in range(0, islands) if i != island]
+    raise ValueError('Unknown topology %r' % topology)
+
+
+def solve_islands(t1, maxtime, islands, topology, interval):
+    """
+    Run the genetic algorithm on one process per island, and return the fittest solution of all islands
+    """
+    inboxes = [multiprocessing.Queue() for i in range(0, islands)]
+    results = multiprocessing.Queue()
+    # Each island needs enough solutions to keep its elites and make children
+    island_size = max(int(len(cities) * population_size_percent) // islands, 2 * int(len(cities) * elitism_percent))
+    seeds = rng.integers(2 ** 32, size=islands).tolist()
+    workers = [multiprocessing.Process(target=island_worker,
+                                       args=(cities, island_size, seeds[i], t1, maxtime, interval, inboxes[i],
+                                             [inboxes[j] for j in island_neighbours(i, islands, topology)], results))
+               for i in range(0, islands)]
+    for worker in workers:
+        worker.start()
+
+    fittest = None
+    received = 0
+    while received < islands:
+        try:
+            solution = results.get(timeout=0.1)
+        except queue.Empty:
+            process_gui_events()
+            continue
+        received += 1
+        if fittest is None or fittest[1] > solution[1]:
+            fittest = solution
+    for worker in workers:
+        worker.join()
+    return fittest
+
+
+def island_worker(island_cities, island_size, seed, t1, maxtime, interval, inbox, neighbours, results):
+    """
+    Process of an island: evolve its own population, send its best solutions to its neighbours every interval
+    generations and integrate the solutions received in place of its worst ones.
+    """
+    global cities, renderer, rng
+    # The renderer belongs to the main process, and forked processes must not share its random state
+    renderer = None
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    cities = island_cities
+    build_distances(cities)
+
+    def migration(gen, population):
+        if gen == 0 or gen % interval != 0:
+            return population
+        emigrants = (population[0][:migration_size].copy(), population[1][:migration_size].copy())
+        for neighbour in neighbours:
+            neighbour.put(emigrants)
+        immigrants = []
+        try:
+            while True:
+                immigrants.append(inbox.get_nowait())
+        except queue.Empty:
+            pass
+        if not immigrants:
+            return population
+        tours = np.concatenate([m[0] for m in immigrants])[:len(population[1]) // 2]
+        scores = np.concatenate([m[1] for m in immigrants])[:len(tours)]
+        population[0][-len(tours):] = tours
+        population[1][-len(tours):] = scores
+        return sort_population(population)
+
+    fittest = evolve(initial_population(cities, island_size), t1, maxtime, migration)
+    # Migrants which were never received must not prevent this process from exiting
+    for neighbour in neighbours:
+        neighbour.cancel_join_thread()
+    results.put(fittest)
+
+
+def solve_decomposed(t1, maxtime, jobs):
+    """
+    Solve the instance by clusters (see decomposition): each cluster is solved by the genetic algorithm on a pool of
+    jobs processes (one per processor if 0), then the tours of the clusters are stitched along a tour of the clusters,
+    and improved by the local search starting from the cities near another cluster.
+    The greedy tour improved by the local search is built first: it is returned if it is better, or if it leaves no
+    time to the clusters. With a maxtime, it and the clusters are solved by decomposition_time_share of it, and the
+    rest is left to the local search of the stitched tour.
+    Return the fittest solution.
+    """
+    greedy = construction.greedy_edge_tour(coordinates, neighbours, rng)
+    if local_search_result:
+        greedy = localsearch.local_search(greedy, coordinates, neighbours,
+                                          deadline=t1 + maxtime * decomposition_time_share if maxtime else None)
+    if maxtime and time.time() >= t1 + maxtime * decomposition_time_share:
+        return [greedy, total_distance(greedy)]
+    clusters = decomposition.partition(coordinates)
+    order = decomposition.cluster_order(coordinates, clusters, rng)
+    clusters = [clusters[i] for i in order]
+    # The clusters share the time left between the processes, each one stops at its own deadline (or at the end
+    # of the clusters), its setup included
+    cluster_time, clusters_end = 0, None
+    if maxtime:
+        jobs = jobs or os.cpu_count() or 1
+        clusters_end = t1 + maxtime * decomposition_time_share
+        cluster_time = max(clusters_end - time.time(), 0) * jobs / len(clusters)
+    seeds = rng.integers(2 ** 32, size=len(clusters)).tolist()
+    tasks = [(coordinates[cluster], seeds[i], cluster_time, clusters_end) for i, cluster in enumerate(clusters)]
+    if multiprocessing.current_process().daemon:
+        # Daemonic processes (like the PVC-tester ones) can't have a pool: the clusters are solved in this process,
+        # with another state than the instance
+        state = SolverState()
+        state.swap()
+        try:
+            tours = [cluster_worker(task) for task in tasks]
+        finally:
+            state.swap()
+    else:
+        with multiprocessing.Pool(jobs or None) as pool:
+            tours = pool.map(cluster_worker, tasks)
+    tour = decomposition.stitch(coordinates, [cluster[t] for cluster, t in zip(clusters, tours)])
+    if local_search_result:
+        tour = localsearch.local_search(tour, coordinates, neighbours, deadline=t1 + maxtime if maxtime else None,
+                                        active=decomposition.boundary_cities(clusters, neighbours, len(coordinates)))
+    if total_distance(greedy) < total_distance(tour):
+        tour = greedy
+    return [tour, total_distance(tour)]
+
+
+def cluster_worker(task):
+    """
+    Solve the cluster of the task (coordinates of its cities, seed, maxtime, time by which all the clusters must be
+    solved or None) with the genetic algorithm, and return its tour as indexes in the cluster.
+    A cluster started at the end of the clusters gets its greedy tour.
+    """
+    global cities, renderer, rng
+    t1 = time.time()
+    cluster_coordinates, seed, maxtime, clusters_end = task
+    renderer = None
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    cities = instances.Instance(np.arange(len(cluster_coordinates)).astype(str), cluster_coordinates)
+    if len(cities) < 3:
+        return np.arange(len(cities))
+    deadline = min(t1 + maxtime, clusters_end) if maxtime else None
+    if deadline is not None and time.time() >= deadline:
+        build_distances(cities, matrix=False)
+        return construction.greedy_edge_tour(coordinates, neighbours, rng)
+    build_distances(cities)
+    time_share = 1 - local_search_time_share if local_search_result else 1
+    if deadline is not None:
+        # Left to the genetic algorithm and the local search after the setup, and never 0 (no time limit)
+        maxtime = max(deadline - t1, 1e-3)
+    population = initial_population(cities, int(len(cities) * population_size_percent))
+    # Without time for a generation, the best initial solution is kept
+    fittest = evolve(population, t1, maxtime * time_share) or [population[0][np.argmin(population[1])]]
+    if local_search_result:
+        return localsearch.local_search(fittest[0], coordinates, neighbours, deadline=deadline)
+    return fittest[0]
 
 
 def evaluate(population):
     """
     Evaluate all solutions of the population.
     """
-    for solution in population:
-        solution[1] = total_distance(solution[0])
+    population[1][:] = population_distances(population[0])
+
+
+def population_distances(tours):
+    """
+    Return the total distances of all the tours of the 2D array (one tour per row), in a single gather-and-sum
+    """
+    if profiling.enabled:
+        profiling.count('distance_evaluations', tours.size)
+    return edges_distance(tours, np.roll(tours, -1, axis=1)).sum(axis=1, dtype=np.float64)
 
 
-def selection(population):
+def sort_population(population):
     """
-    Call the selection method
+    Return the population sorted from the best to the worst solution
+    """
+    order = np.argsort(population[1], kind='stable')
+    return [population[0][order], population[1][order]]
+
+
+def selection(population, method=None):
+    """
+    Call the selection method (selection_method if None)
     """
     elite_quantity = int(len(cities) * elitism_percent)
-    #return selection_elites(population, elite_quantity)
-    #return selection_tournament(population, elite_quantity)
+    method = method or selection_method
+    if method == 'elites':
+        return selection_elites(population, elite_quantity)
+    if method == 'tournament':
+        return selection_tournament(population, elite_quantity)
+    if method == 'unique':
+        return selection_unique(population, elite_quantity)
     return selection_SENGOKU(population, elite_quantity)
 
 
-def crossover(subpopulation, quantity):
+def crossover(subpopulation, quantity, deadline=None):
     """
-    Call the crossover method
+    Call the crossover method chosen by crossover_method.
+    The edge crossovers stop making children at the deadline (a time.time() value) if given, and return fewer.
     """
+    if crossover_method == 'eax':
+        return crossover_edge_assembly(subpopulation, quantity, deadline)
+    if crossover_method == 'erx':
+        return crossover_edge_recombination(subpopulation, quantity, deadline)
     return crossover_two_points(subpopulation, quantity)
 
 
-def mutate(solution):
+def mutate(population, i, method=None):
+    """
+    Call the mutation method (mutation_method if None) on the i-th solution of the population,
+    and update its score with the delta returned by the mutation
+    """
+    method = method or mutation_method
+    if method == 'swap':
+        delta = mutate_swap(population[0][i])
+    elif method == 'reverse':
+        delta = mutate_reverse(population[0][i])
+    else:
+        delta = mutate_2opt(population[0][i])
+    population[1][i] += delta
+    if check_delta_fitness:
+        check_score(population[0][i], population[1][i])
+
+
+def check_score(solution, score):
     """
-    Call the mutation method
+    Debug check: compare an incrementally computed score with a full evaluation of the solution
     """
-    #mutate_swap(solution)
-    mutate_2opt(solution)
-    #mutate_reverse(solution)
+    distance = total_distance(solution)
+    if abs(distance - score) > 1e-6 * max(1.0, distance):
+        raise AssertionError('Incremental score %f differs from total distance %f' % (score, distance))
 
 
 def selection_elites(population, elite_quantity):
     """
     Return the best N solution from population. Where N = elite_quantity
     """
-    return [population[i] for i in range(0, elite_quantity)]
+    best = top_solutions(population[1], elite_quantity)
+    return [population[0][best], population[1][best]]
 
 
 def selection_tournament(population, elite_quantity):
@@ -242,19 +837,18 @@ def selection_tournament(population, elite_quantity):
     Return N solutions from population by applying a tournament selection. Where N = elite_quantity
     We take X(tournament_size) solutions from the population, then we save the best solution, and delete it from the population.
     We return all the saved solutions.
+    All the missing tournaments are played at once, until there are N different winners.
     """
-    winners = []
-    for i in range(0, elite_quantity):
-        competitors = []
-        for j in range(0, tournament_size):
-            competitor = population[random.randint(0, len(population) - 1)]
-            while competitor in competitors:
-                competitor = population[random.randint(0, len(population) - 1)]
-            competitors.append(competitor)
-        competitors.sort(key=lambda s: s[1])
-        winners.append(competitors[0])
-        population.remove(competitors[0])
-    return winners
+    available = np.ones(len(population[1]), dtype=bool)
+    winners = np.empty(0, dtype=np.intp)
+    while len(winners) < elite_quantity and available.any():
+        pool = np.flatnonzero(available)
+        competitors = pool[rng.integers(0, len(pool), (elite_quantity - len(winners), min(tournament_size, len(pool))))]
+        best = competitors[np.arange(len(competitors)), np.argmin(population[1][competitors], axis=1)]
+        best = np.unique(best)
+        available[best] = False
+        winners = np.concatenate((winners, best))
+    return [population[0][winners], population[1][winners]]
 
 
 def selection_SENGOKU(population, elite_quantity):
@@ -262,154 +856,316 @@ def selection_SENGOKU(population, elite_quantity):
     Return N solutions from the population by applying a natural selection. Where N = elite_quantity
     We want the best. In order to get the greatest diversity from the population, we remove all similar solutions.
     By removing the similar solutions, we won't go to a local minima.
+    A solution is removed when its total distance is similar to the one of the previous solution, once sorted.
     """
-    i = 1
-    while i < len(population):
-        if is_solutions_similar(population[i - 1], population[i]):
-            del population[i]
-        else:
-            i += 1
-    while len(population) > elite_quantity:
-        del population[-1]
-    return population
+    order = np.argsort(population[1], kind='stable')
+    scores = population[1][order]
+    kept = order[np.concatenate(([True], np.diff(scores) >= 1e-6))]
+    if profiling.enabled:
+        profiling.count('duplicates_removed', len(order) - len(kept))
+    kept = kept[:elite_quantity]
+    return [population[0][kept], population[1][kept]]
+
+
+def selection_unique(population, elite_quantity):
+    """
+    Return the best N solutions from the population, without duplicated tours. Where N = elite_quantity
+    Two tours are duplicated if they are the same cycle, whatever its first city and its direction.
+    """
+    hashes = tours_hashes(population[0])
+    unique = np.unique(hashes, return_index=True)[1]
+    if profiling.enabled:
+        profiling.count('duplicates_removed', len(hashes) - len(unique))
+    best = unique[top_solutions(population[1][unique], elite_quantity)]
+    return [population[0][best], population[1][best]]
+
+
+def top_solutions(scores, quantity):
+    """
+    Return the indexes of the best N scores, sorted from the best. Where N = quantity
+    Only these N scores are sorted, after a partition of all the scores.
+    """
+    if quantity < len(scores):
+        best = np.argpartition(scores, quantity - 1)[:quantity]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(scores[best], kind='stable')]
+
+
+def canonical_tours(tours):
+    """
+    Return the tours of the 2D array rotated to start with the city 0, and in the direction where the second city
+    has a lower index than the last one. Two tours are the same cycle if and only if their canonical forms are equal.
+    """
+    rows = np.arange(len(tours))[:, np.newaxis]
+    start = np.argmin(tours, axis=1)
+    canonical = tours[rows, (np.arange(tours.shape[1]) + start[:, np.newaxis]) % tours.shape[1]]
+    backward = canonical[:, 1] > canonical[:, -1]
+    canonical[backward, 1:] = canonical[backward, :0:-1]
+    return canonical
+
 
+def tours_hashes(tours):
+    """
+    Return a 64 bits hash of each tour of the 2D array, equal for tours which are the same cycle
+    """
+    weights = np.random.default_rng(tours.shape[1]).integers(1, 2 ** 63, tours.shape[1], dtype=np.uint64)
+    return (canonical_tours(tours).astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
 
-def crossover_two_points(subpopulation, quantity):
+
+def crossover_two_points(subpopulation, quantity, batched=True):
     """
     Apply the two points crossover function on the subpopulation.
     Return N new solutions. Where N = quantity
+    In batched mode, all the children are produced at once by cross_population,
+    otherwise they are produced pair by pair by cross_two_solutions.
     """
+    tours = subpopulation[0]
+    if profiling.enabled:
+        profiling.count('crossovers', int(quantity))
+    if batched:
+        pairs = (int(quantity) + 1) // 2
+        s1 = rng.integers(0, len(tours), pairs)
+        # A single parent (all the others being duplicates) is crossed with itself
+        s2 = (s1 + rng.integers(1, max(len(tours), 2), pairs)) % len(tours)
+        p1 = rng.integers(1, tours.shape[1] - 1, pairs)
+        p2 = 1 + (p1 - 1 + rng.integers(1, tours.shape[1] - 2, pairs)) % (tours.shape[1] - 2)
+        p1, p2 = np.minimum(p1, p2), np.maximum(p1, p2)
+        crossed = cross_population(np.concatenate((tours[s1], tours[s2])), np.concatenate((tours[s2], tours[s1])),
+                                   np.concatenate((p1, p1)), np.concatenate((p2, p2)))[:int(quantity)]
+        return [crossed, population_distances(crossed)]
+
     crossed = []
     while len(crossed) < quantity:
-        s1 = subpopulation[random.randint(0, len(subpopulation) - 1)]
+        s1 = random.randint(0, len(tours) - 1)
         s2 = s1
         while s1 == s2:
-            s2 = subpopulation[random.randint(0, len(subpopulation) - 1)]
-        p1 = random.randint(1, len(s1[0]) - 2)
+            s2 = random.randint(0, len(tours) - 1)
+        p1 = random.randint(1, tours.shape[1] - 2)
         p2 = p1
         while p1 == p2:
-            p2 = random.randint(1, len(s2[0]) - 2)
+            p2 = random.randint(1, tours.shape[1] - 2)
         if p1 > p2:
             temp = p2
             p2 = p1
             p1 = temp
 
-        children = cross_two_solutions(s1[0].copy(), s2[0].copy(), p1, p2)
+        children = cross_two_solutions(tours[s1].tolist(), tours[s2].tolist(), p1, p2)
 
         crossed += children
 
-    if len(crossed) > quantity:
-        return crossed[:-1]
-    return crossed
+    crossed = np.array(crossed[:quantity], dtype=np.intp).reshape(-1, tours.shape[1])
+    return [crossed, population_distances(crossed)]
+
+
+def crossover_edge_recombination(subpopulation, quantity, deadline=None):
+    """
+    Return quantity children of random pairs of the subpopulation, by edge recombination (see recombination),
+    or those made before the deadline
+    """
+    tours = subpopulation[0].tolist()
+    xs, ys, near = coordinates[:, 0].tolist(), coordinates[:, 1].tolist(), neighbours.tolist()
+    crossed = []
+    while len(crossed) < quantity and (deadline is None or time.time() < deadline):
+        # A single parent (all the others being duplicates) is copied
+        if len(tours) == 1:
+            crossed.append(tours[0])
+            continue
+        s1 = random.randint(0, len(tours) - 1)
+        s2 = (s1 + random.randint(1, len(tours) - 1)) % len(tours)
+        crossed.append(recombination.edge_recombination(tours[s1], tours[s2], xs, ys, near, random))
+    crossed = np.array(crossed, dtype=np.intp).reshape(-1, len(near))
+    # The children made, fewer than quantity at the deadline
+    if profiling.enabled:
+        profiling.count('crossovers', len(crossed))
+    return [crossed, population_distances(crossed)]
+
+
+def crossover_edge_assembly(subpopulation, quantity, deadline=None):
+    """
+    Return quantity children by edge assembly crossover (see recombination): the subpopulation is shuffled, and
+    each solution makes up to eax_children_per_pair children with the next one, each from a different AB-cycle.
+    A solution identical to the next one is copied. Only the children made before the deadline are returned.
+    """
+    tours = subpopulation[0].tolist()
+    xs, ys, near = coordinates[:, 0].tolist(), coordinates[:, 1].tolist(), neighbours.tolist()
+    order = rng.permutation(len(tours)).tolist()
+    crossed = []
+    i = 0
+    while len(crossed) < quantity and (deadline is None or time.time() < deadline):
+        parent1, parent2 = tours[order[i % len(order)]], tours[order[(i + 1) % len(order)]]
+        cycles = recombination.ab_cycles(parent1, parent2, random)
+        if not cycles:
+            crossed.append(parent1)
+        for cycle in random.sample(cycles, min(eax_children_per_pair, len(cycles), int(quantity) - len(crossed))):
+            if deadline is not None and time.time() >= deadline:
+                break
+            crossed.append(recombination.edge_assembly(parent1, cycle, xs, ys, near))
+        i += 1
+    crossed = np.array(crossed, dtype=np.intp).reshape(-1, len(near))
+    # The children made, fewer than quantity at the deadline
+    if profiling.enabled:
+        profiling.count('crossovers', len(crossed))
+    return [crossed, population_distances(crossed)]
 
 
 def cross_two_solutions(solution1, solution2, p1, p2):
     """
-    Apply a crossover with the two solutions passed in parameter.
-    Return two new solutions from the parent (One if the two are the same)
+    Apply a crossover with the two tours passed in parameter.
+    Return two new tours from the parent (One if the two are the same)
     """
-    middle_cities1 = solution1[p1:p2]
-    middle_cities2 = solution2[p1:p2]
+    child1 = order_crossover(solution1, solution2, p1, p2)
+    child2 = order_crossover(solution2, solution1, p1, p2)
+
+    if is_solutions_equal([child1, None], [child2, None]):
+        return [child1]
+    return [child1, child2]
 
-    pack_cities(solution1, middle_cities2, p1, p2)
-    pack_cities(solution2, middle_cities1, p1, p2)
 
+def order_crossover(parent, donor, p1, p2):
+    """
+    Return a child with the path between p1 and p2 of the donor.
+    The other cities are put in the order of the parent, starting from p2, in O(n) with a "used" mask.
+    """
+    used = [False] * len(parent)
+    child = list(parent)
     for i in range(p1, p2):
-        solution1[i] = middle_cities2[i - p1]
-        solution2[i] = middle_cities1[i - p1]
-
-    solution1 = [solution1, total_distance(solution1)]
-    solution2 = [solution2, total_distance(solution2)]
-
-    if is_solutions_equal(solution1, solution2):
-        return [solution1]
-    return [solution1, solution2]
-
-
-def pack_cities(solution, middle_cities, p1, p2):
-    """
-    Pack all the cities to the right of the p2 point.
-    Then all points between p1 and p2 are None.
-    """
-    for i in range(0, len(solution)):
-        if solution[i] in middle_cities:
-            solution[i] = None
-    i = p2
-    while i != p1:
-        if solution[i] is None:
-            j = i + 1
-            while j >= len(solution) - 1 or solution[j] is None:
-                if j >= len(solution) - 1:
-                    j = 0
-                else:
-                    j += 1
-            solution[i] = solution[j]
-            solution[j] = None
-        if i >= len(solution) - 1:
-            i = 0
-        else:
-            i += 1
+        child[i] = donor[i]
+        used[donor[i]] = True
+    j = p2 if p2 < len(parent) else 0
+    for k in range(0, len(parent)):
+        city = parent[(p2 + k) % len(parent)]
+        if not used[city]:
+            child[j] = city
+            j = j + 1 if j + 1 < len(parent) else 0
+    return child
+
+
+def cross_population(parents, donors, p1, p2):
+    """
+    Apply the order crossover of order_crossover on all the rows of the parents and donors arrays at once.
+    p1 and p2 are arrays with the crossing points of each row. Return the array of children.
+    """
+    rows = np.arange(len(parents))[:, np.newaxis]
+    n = parents.shape[1]
+    # Work in coordinates rolled to start at p2, where the path of the donor is at the end of the row
+    rolled = (np.arange(n)[np.newaxis, :] + p2[:, np.newaxis]) % n
+    parents_rolled = parents[rows, rolled]
+    children_rolled = donors[rows, rolled]
+    donors_positions = np.empty_like(donors)
+    donors_positions[rows, donors] = np.arange(n)
+    positions = donors_positions[rows, parents_rolled]
+    kept = (positions < p1[:, np.newaxis]) | (positions >= p2[:, np.newaxis])
+    destinations = np.cumsum(kept, axis=1) - 1
+    r, c = np.nonzero(kept)
+    children_rolled[r, destinations[r, c]] = parents_rolled[r, c]
+    children = np.empty_like(parents)
+    children[rows, rolled] = children_rolled
+    return children
 
 
 def mutate_swap(solution):
     """
-    Just swap two random points of the solution
+    Just swap two random points of the solution.
+    Return the delta of the total distance.
     """
     p1 = random.randint(0, len(solution) - 1)
     p2 = p1
     while p1 == p2:
         p2 = random.randint(0, len(solution) - 1)
+    # Edges (i, i + 1) touching one of the two points
+    edges = {(p1 - 1) % len(solution), p1, (p2 - 1) % len(solution), p2}
+    if profiling.enabled:
+        profiling.count('distance_evaluations', 2 * len(edges))
+    before = edges_length(solution, edges)
     temp = solution[p1]
     solution[p1] = solution[p2]
     solution[p2] = temp
+    return edges_length(solution, edges) - before
+
+
+def edges_length(solution, edges):
+    """
+    Return the length of the edges (i, i + 1) of the solution, for all i in edges
+    """
+    return sum(distance_between(solution[i], solution[i + 1 if i + 1 < len(solution) else 0]) for i in edges)
 
 
 def mutate_2opt(solution):
     """
     Take two random edges, and check if the reversal of the path between points of the edges improves our solution.
-    If it's improved, then do the mutation
+    If it's improved, then do the mutation.
+    Return the delta of the total distance (0 if no mutation was done).
     """
-    improved = False
+    if len(solution) < 4:
+        return 0
     mutation_try = 0
-    while not improved and mutation_try < limit_mutation_try:
+    while mutation_try < limit_mutation_try:
         p1 = random.randint(0, len(solution) - 1)
         p2 = p1 + 1 if p1 + 1 < len(solution) else 0
         p3, p4 = p1, p2
         while abs(p1 - p3) < 2 or abs(p2 - p4) < 2:
             p3 = random.randint(0, len(solution) - 1)
             p4 = p3 + 1 if p3 + 1 < len(solution) else 0
-        if distance_between(solution[p1], solution[p2]) + distance_between(solution[p3],solution[p4]) > \
-                        distance_between(solution[p1], solution[p3]) + distance_between(solution[p2], solution[p4]):
-            solution[p2], solution[p3] = solution[p3], solution[p2]
-            reverse(solution, p2, p3)
-            improved = True
-        elif distance_between(solution[p1], solution[p2]) + distance_between(solution[p3], solution[p4]) > \
-                        distance_between(solution[p1], solution[p4]) + distance_between(solution[p3], solution[p2]):
-            solution[p2], solution[p4] = solution[p4], solution[p2]
+        delta = distance_between(solution[p1], solution[p3]) + distance_between(solution[p2], solution[p4]) - \
+            distance_between(solution[p1], solution[p2]) - distance_between(solution[p3], solution[p4])
+        if delta < 0:
+            # Reverse the path from p2 to p3 included
             reverse(solution, p2, p4)
-            improved = True
+            if profiling.enabled:
+                profiling.count('2opt_failed_tries', mutation_try)
+                profiling.count('2opt_successes')
+                profiling.count('distance_evaluations', 4 * (mutation_try + 1))
+            return delta
         mutation_try += 1
+    if profiling.enabled:
+        profiling.count('2opt_failed_tries', mutation_try)
+        profiling.count('distance_evaluations', 4 * mutation_try)
+    return 0
 
 
 def mutate_reverse(solution):
     """
-    Mutate just by reversing a path between two random points
+    Mutate just by reversing a path between two random points.
+    Return the delta of the total distance.
     """
     p1 = random.randint(0, len(solution) - 1)
     p2 = p1
     while p1 == p2:
         p2 = random.randint(0, len(solution) - 1)
+    # Only the edges entering and leaving the reversed path change
+    if profiling.enabled:
+        profiling.count('distance_evaluations', 4)
+    before = distance_between(solution[p1 - 1], solution[p1]) + distance_between(solution[p2 - 1], solution[p2])
+    after = distance_between(solution[p1 - 1], solution[p2 - 1]) + distance_between(solution[p1], solution[p2])
     reverse(solution, p1, p2)
+    return after - before
 
 
 def reverse(solution, p1, p2):
     """
-    Reverse the path between the two points in the given solution
+    Reverse the path between the two points (p2 excluded, wrapping around the end) in the given solution array.
+    If the rest of the tour is shorter, it is reversed instead, which gives the same circular tour.
+    The path is copied through a buffer kept between calls, so no memory is allocated.
     """
-    trip = solution[p1:p2] if p1 < p2 else solution[p1:] + solution[:p2]
-    while p1 != p2:
-        solution[p1] = trip.pop()
-        p1 = p1 + 1 if p1 + 1 < len(solution) else 0
+    global reverse_buffer
+    length = (p2 - p1) % len(solution)
+    if 2 * length > len(solution):
+        p1, length = p2, len(solution) - length
+    if length < 2:
+        return
+    if reverse_buffer is None or len(reverse_buffer) < len(solution) or reverse_buffer.dtype != solution.dtype:
+        reverse_buffer = np.empty(len(solution), dtype=solution.dtype)
+    reversed_path = reverse_buffer[length - 1::-1]
+    if p1 + length <= len(solution):
+        reverse_buffer[:length] = solution[p1:p1 + length]
+        solution[p1:p1 + length] = reversed_path
+    else:
+        head = len(solution) - p1
+        reverse_buffer[:head] = solution[p1:]
+        reverse_buffer[head:length] = solution[:length - head]
+        solution[p1:] = reversed_path[:head]
+        solution[:length - head] = reversed_path[head:]
 
 
 def is_solutions_similar(solution1, solution2):
@@ -423,55 +1179,85 @@ def is_solutions_equal(solution1, solution2):
     """
     Compare if the two solutions are equal
     """
-    for i in range(0, len(solution1)):
-        if solution1[0][i][0] != solution2[0][i][0]:
+    for i in range(0, len(solution1[0])):
+        if solution1[0][i] != solution2[0][i]:
             return False
     return True
 
 
+def build_distances(cities, matrix=True):
+    """
+    Build the distance backend for the cities: the coordinates array and, if matrix is True and the instance is not
+    too big, the matrix of all the distances between cities, computed once. The neighbour lists are built if the
+    solver uses them, and None otherwise.
+    """
+    global coordinates, distances, neighbours
+    coordinates = np.asarray(cities.coordinates, dtype=np.float64)
+    if local_search_elites > 0 or local_search_result or seeded_percent > 0 or crossover_method != 'two_points' \
+            or not matrix:
+        neighbours = localsearch.neighbour_lists(coordinates)
+    else:
+        neighbours = None
+    if not matrix or len(cities) > distance_matrix_max_cities:
+        distances = None
+        return
+    dtype = np.float32 if len(cities) >= distance_matrix_float32_from else np.float64
+    distances = np.empty((len(cities), len(cities)), dtype=dtype)
+    x, y = coordinates[:, 0], coordinates[:, 1]
+    rows = max(1, distance_matrix_block_cells // len(cities))
+    for start in range(0, len(cities), rows):
+        block = slice(start, start + rows)
+        distances[block] = np.hypot(x[block, np.newaxis] - x, y[block, np.newaxis] - y)
+
+
+def edges_distance(c1, c2):
+    """
+    Return the distances between the cities of the two arrays of indexes, element by element
+    """
+    if distances is not None:
+        return distances[c1, c2]
+    delta = coordinates[c1] - coordinates[c2]
+    return np.sqrt((delta * delta).sum(axis=-1))
+
+
 def total_distance(solution):
     """
     Return total distance between all cities, in a circular way (including distance between last and first)
     """
-    distance = 0
-    c2 = None
-    for c in solution:
-        c1 = c2
-        c2 = c
-        if c1 is not None and c2 is not None:
-            distance += distance_between(c1, c2)
-
-    distance += distance_between(solution[0], solution[len(solution) - 1])
-    return distance
+    solution = np.asarray(solution)
+    if profiling.enabled:
+        profiling.count('distance_evaluations', len(solution))
+    return float(edges_distance(solution, np.roll(solution, -1)).sum())
 
 
 def distance_between(city1, city2):
     """
-    Return the distance between two cities
+    Return the distance between two cities, given by their indexes
     """
-    return math.sqrt((city1[1][0] - city2[1][0]) * (city1[1][0] - city2[1][0]) +
-                     (city1[1][1] - city2[1][1]) * (city1[1][1] - city2[1][1]))
+    if distances is not None:
+        return distances[city1, city2]
+    return math.hypot(coordinates[city1, 0] - coordinates[city2, 0], coordinates[city1, 1] - coordinates[city2, 1])
 
 
 def is_solution_in_population(solution, population):
     """
     Return true if the solution is in the population
     """
-    return any(abs(sol[1] - solution[1]) < 1e-9 for sol in population)
+    return bool(np.any(np.abs(population[1] - solution[1]) < 1e-9))
 
 
 def initial_population(cities, quantity):
     """
     Create the initial population from the cities passed in parameter.
-    Each solution is a shuffle of the cities set
+    Each solution is a shuffle of the indexes of the cities, one per row of the tours array,
+    except seeded_percent of them built with the seeding_strategies in turn.
     """
-    population = []
-    while len(population) < quantity:
-        solution = cities.copy()
-        random.shuffle(solution)
-        solution = [solution, total_distance(solution)]
-        population.append(solution)
-    return population
+    tours = np.argsort(rng.random((int(quantity), len(cities))), axis=1)
+    if seeding_strategies:
+        for i in range(0, int(quantity * seeded_percent)):
+            strategy = seeding_strategies[i % len(seeding_strategies)]
+            tours[i] = construction.build_tour(strategy, coordinates, neighbours, rng)
+    return [tours, population_distances(tours)]
 
 
 if __name__ == '__main__':
@@ -480,7 +1266,46 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Voyageur de commerce')
     parser.add_argument('--nogui', default=True, action='store_false')
     parser.add_argument('--maxtime', type=int, default=0)
+    parser.add_argument('--islands', type=int, default=1, help='number of processes, each evolving its own population')
+    parser.add_argument('--topology', choices=('ring', 'complete'), default='ring',
+                        help='islands receiving the best solutions of each island')
+    parser.add_argument('--migration-interval', type=int, default=migration_interval,
+                        help='generations between two migrations')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random generators')
+    parser.add_argument('--checkpoint', default=None, help='file where the state is saved periodically')
+    parser.add_argument('--checkpoint-interval', type=float, default=checkpoint_interval,
+                        help='seconds between two checkpoints')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint file if it exists')
+    parser.add_argument('--warm-start', default=None,
+                        help='checkpoint or tour file whose tours are put in the initial population')
+    parser.add_argument('--result-cache', default=None,
+                        help='directory of the cache of the best tours, reused when the same cities are solved again')
+    parser.add_argument('--decompose', action='store_true', default=None,
+                        help='solve the instance by clusters (see decomposition_min_cities for the default)')
+    parser.add_argument('--target-gap', type=float, default=None,
+                        help='stop once the tour is within this share of the lower bound (0.01 for 1%%)')
+    parser.add_argument('--adaptive', action='store_true', default=adaptive_control,
+                        help='choose the operators and adapt the mutation rate and the population size while running')
+    parser.add_argument('--adaptive-log', default=None,
+                        help='file where the schedule of the adaptive control is written '
+                             '(with the statistics of the operators as JSON if it ends with .json, else as CSV)')
+    parser.add_argument('--profile', default=None,
+                        help='file where the stage timers, counters and convergence trace are written '
+                             '(JSON if it ends with .json, else the trace as CSV)')
     parser.add_argument('filename', nargs='?', default=None)
 
     args = parser.parse_args()
-    print(ga_solve(args.filename, args.nogui, args.maxtime))
+    checkpoint_interval = args.checkpoint_interval
+    adaptive_control = args.adaptive
+    adaptive_log = args.adaptive_log
+    profiling.enabled = args.profile is not None
+    best = None
+    for best in solve_iter(args.filename, args.nogui, args.maxtime, args.islands, args.topology,
+                           args.migration_interval, args.seed, args.checkpoint, args.resume, args.warm_start,
+                           args.result_cache, args.decompose, args.target_gap):
+        pass
+    print((best.length, best.tour))
+    if best.gap is not None:
+        print('Gap to the lower bound: %.2f%%' % (100 * best.gap))
+    if args.profile is not None:
+        profiling.export(args.profile)
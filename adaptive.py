@@ -0,0 +1,151 @@
+"""
+    Adaptive control of the genetic algorithm.
+
+    The selection and the mutation methods are chosen at each generation by two multi-armed bandits, from the
+    improvement of the scores they gave per CPU second:
+    - a selection method gets the decrease of the mean score of the elites from one generation to the next,
+      per CPU second of the generation
+    - a mutation method gets the decrease of the total score of the mutated solutions, per CPU second of the mutations
+    The bandits play UCB1 on the mean rewards divided by the biggest one, each mean being an exponential moving
+    average: the payoff of an operator changes as the population converges.
+
+    When the best solution stagnates, every stagnation_generations generations the controller climbs a ladder:
+    the mutation rate is raised, then the population is enlarged, then the population is restarted from its best
+    solutions, and the ladder starts again. A better solution brings the rate and the size back to their base values.
+
+    The schedule (the choices and events of each generation) can be written to a file, to pick the settings to freeze.
+"""
+import csv
+import json
+import math
+
+# Weight of the last reward in the mean reward of an arm
+reward_smoothing = 0.3
+# Weight of the exploration term of UCB1
+exploration = 0.5
+# Generations without better solution between two steps of the stagnation ladder
+stagnation_generations = 10
+# Factor of the mutation rate at the first step of the ladder
+mutation_boost = 2
+# Maximal mutation rate
+max_mutation_percent = 60 / 100
+# Factor of the population size at the second step of the ladder
+population_boost = 1.5
+# Quantity of best solutions kept when the population is restarted
+restart_survivors = 1
+
+
+class Bandit:
+    """
+    Multi-armed bandit choosing among the arms (names of methods)
+    """
+
+    def __init__(self, arms):
+        self.arms = list(arms)
+        self.plays = [0] * len(self.arms)
+        self.means = [0.0] * len(self.arms)
+        self.total = 0
+
+    def choose(self):
+        """
+        Return the arm to play: one never played, or the best by UCB1
+        """
+        for arm, plays in zip(self.arms, self.plays):
+            if plays == 0:
+                return arm
+        scale = max(self.means) or 1.0
+        log_total = math.log(self.total)
+        scores = [mean / scale + exploration * math.sqrt(log_total / plays)
+                  for mean, plays in zip(self.means, self.plays)]
+        return self.arms[scores.index(max(scores))]
+
+    def reward(self, arm, value):
+        """
+        Record the reward of a play of the arm
+        """
+        i = self.arms.index(arm)
+        self.plays[i] += 1
+        self.total += 1
+        self.means[i] = value if self.plays[i] == 1 else self.means[i] + reward_smoothing * (value - self.means[i])
+
+    def report(self):
+        """
+        Return the plays and the mean reward of each arm
+        """
+        return {arm: {'plays': plays, 'mean_reward': mean}
+                for arm, plays, mean in zip(self.arms, self.plays, self.means)}
+
+
+class Controller:
+    """
+    Adaptive control of a run of the genetic algorithm: the bandits of the selection and mutation methods,
+    the current mutation rate and population size, and the schedule
+    """
+
+    def __init__(self, selections, mutations, mutation_percent, population_size):
+        self.selection = Bandit(selections)
+        self.mutation = Bandit(mutations)
+        self.base_mutation_percent = self.mutation_percent = mutation_percent
+        self.base_population_size = self.population_size = population_size
+        self.schedule = []
+
+    def choose(self):
+        """
+        Return the selection and mutation methods of the generation
+        """
+        return self.selection.choose(), self.mutation.choose()
+
+    def improved(self):
+        """
+        Bring the mutation rate and the population size back to their base values, after a better solution
+        """
+        self.mutation_percent = self.base_mutation_percent
+        self.population_size = self.base_population_size
+
+    def stagnation(self, generations):
+        """
+        Climb the ladder after this quantity of generations without better solution.
+        Return the event: None, 'mutation' (raised rate), 'population' (enlarged) or 'restart'
+        """
+        if generations == 0 or generations % stagnation_generations:
+            return None
+        step = (generations // stagnation_generations - 1) % 3
+        if step == 0:
+            self.mutation_percent = min(self.mutation_percent * mutation_boost, max_mutation_percent)
+            return 'mutation'
+        if step == 1:
+            self.population_size = int(self.population_size * population_boost)
+            return 'population'
+        self.improved()
+        return 'restart'
+
+    def record(self, generation, elapsed, selection, mutation, event, best):
+        """
+        Add a generation to the schedule: its methods, the event at its end, the mutation rate and population size
+        for the next generation, and the best length
+        """
+        self.schedule.append((generation, elapsed, selection, mutation, self.mutation_percent, self.population_size,
+                              event or '', best))
+
+    def report(self):
+        """
+        Return the schedule and the statistics of the bandits as a dictionary
+        """
+        return {'selection': self.selection.report(), 'mutation': self.mutation.report(),
+                'schedule': [{'generation': g, 'elapsed': e, 'selection': s, 'mutation': m, 'mutation_percent': r,
+                              'population_size': p, 'event': v, 'best': b}
+                             for g, e, s, m, r, p, v, b in self.schedule]}
+
+    def export(self, filename):
+        """
+        Write the schedule to the file: with the statistics of the bandits as JSON if its name ends with .json,
+        otherwise as CSV
+        """
+        with open(filename, 'w', newline='') as f:
+            if filename.endswith('.json'):
+                json.dump(self.report(), f, indent=2)
+            else:
+                writer = csv.writer(f)
+                writer.writerow(['generation', 'elapsed', 'selection', 'mutation', 'mutation_percent',
+                                 'population_size', 'event', 'best'])
+                writer.writerows(self.schedule)
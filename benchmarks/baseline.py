@@ -0,0 +1,43 @@
+"""
+    Baselines of the benchmarks: results saved as JSON, and compared with new results to find the regressions.
+
+    Results are a dictionary of measures by name (like "total_distance n=1000"), lower being better (seconds,
+    lengths). A measure regresses if it is more than tolerance (a share of the baseline) and more than floor (in the
+    unit of the measure, for the noise of the smallest ones) above its baseline.
+    Measures missing from the results or from the baseline are not compared. Times only compare on the same machine.
+"""
+import json
+
+
+def save(filename, results):
+    """
+    Write the results to the baseline file
+    """
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(filename):
+    """
+    Return the results of the baseline file
+    """
+    with open(filename) as f:
+        return json.load(f)
+
+
+def regressions(results, baseline, tolerance, floor=0):
+    """
+    Return the (name, baseline, result) of the measures more than tolerance and floor above their baseline
+    """
+    return [(name, baseline[name], value) for name, value in sorted(results.items())
+            if name in baseline and value > baseline[name] * (1 + tolerance) and value - baseline[name] > floor]
+
+
+def check(results, filename, tolerance, floor=0):
+    """
+    Compare the results with the baseline file, print the regressions, and return True if there is none
+    """
+    found = regressions(results, load(filename), tolerance, floor)
+    for name, reference, value in found:
+        print('REGRESSION %s: %.6g instead of %.6g (+%.1f%%)' % (name, value, reference, 100 * (value / reference - 1)))
+    return not found
@@ -0,0 +1,142 @@
+"""
+    Microbenchmarks of the hot functions of the solver, on uniform instances of n cities (see data/generate_cities.py).
+
+    The solver is set up for each size as for a run (distance matrix up to distance_matrix_max_cities cities), with a
+    population of 10 tours per city bounded to max_population_cells cities in all. Each function is called on
+    prepared arguments until min_time seconds are spent, repeat times, and the median time per call is kept.
+    The functions changing the tour in place start each measure from the same tour and random draws.
+    The order crossover of cross_two_solutions is measured in place of pack_cities, which it replaced.
+
+    With --save-baseline, the times are saved; with --baseline, they are compared with the saved ones and the
+    benchmark fails (exit status 1) if one of them is more than --tolerance and --floor seconds slower (see baseline).
+    The default tolerance is above the noise between runs of the same code on a shared machine (up to 50%).
+
+    Usage: micro.py [--sizes N,N,...] [--repeat N] [--json FILE] [--save-baseline FILE] [--baseline FILE]
+                    [--tolerance SHARE] [--floor SECONDS] [function ...]
+"""
+import os
+import random
+import statistics
+import sys
+import timeit
+
+import numpy as np
+
+import baseline
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'data'))
+
+import generate_cities
+import instances
+import PerezVaucher
+
+# Quantities of cities
+sizes = (10, 100, 1000, 10000, 100000)
+# Functions measured (by default)
+functions = ('total_distance', 'distance_between', 'cross_two_solutions', 'mutate_2opt', 'reverse',
+             'selection_SENGOKU')
+# Measures of each function
+repeat = 9
+# Minimal time of a measure, in seconds
+min_time = 0.2
+# Maximal size of the population, in cities (tours times cities)
+max_population_cells = 10 ** 7
+# Slowdown of a function above which it regresses, in share of its baseline
+tolerance = 60 / 100
+# Slowdown of a function below which it doesn't regress, in seconds (the noise of the sub-microsecond calls)
+floor = 0.2e-6
+
+
+def calls(n, rng):
+    """
+    Return the calls to measure on the instance of n cities set up in the solver, as (function without arguments,
+    setup called before each measure or None)
+    """
+    tour = rng.permutation(n)
+    work = tour.copy()
+    tour_list = tour.tolist()
+    donor = rng.permutation(n).tolist()
+    a, b = rng.integers(0, n, 2).tolist()
+    p1, p2 = sorted(rng.choice(np.arange(1, max(n - 1, 3)), 2, replace=False).tolist())
+    population_size = max(2, min(10 * n, max_population_cells // n))
+    population = PerezVaucher.initial_population(PerezVaucher.cities, population_size)
+    elite_quantity = max(1, min(int(n * PerezVaucher.elitism_percent), population_size))
+
+    def reset():
+        # The calls changing the work tour in place would otherwise measure less and less work
+        work[:] = tour
+        random.seed(0)
+
+    return {
+        'total_distance': (lambda: PerezVaucher.total_distance(tour), None),
+        'distance_between': (lambda: PerezVaucher.distance_between(a, b), None),
+        'cross_two_solutions': (lambda: PerezVaucher.cross_two_solutions(tour_list, donor, p1, p2), None),
+        'mutate_2opt': (lambda: PerezVaucher.mutate_2opt(work), reset),
+        'reverse': (lambda: PerezVaucher.reverse(work, p1, p2), reset),
+        'selection_SENGOKU': (lambda: PerezVaucher.selection_SENGOKU(population, elite_quantity), None),
+    }
+
+
+def measure(call, setup=None):
+    """
+    Return the median time of a call, in seconds, the setup (if given) being called before each measure
+    """
+    timer = timeit.Timer(call, setup or 'pass')
+    number, elapsed = timer.autorange()
+    number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+    return statistics.median(timer.repeat(repeat, number)) / number
+
+
+def run(selected, sizes):
+    """
+    Return the time of each function at each size, by "function n=size"
+    """
+    results = {}
+    for n in sizes:
+        coordinates = generate_cities.generate(n, 'uniform', 0, max(generate_cities.MAX_X, n))
+        instance = instances.Instance(np.arange(n).astype(str), coordinates.astype(np.float64))
+        # The solver globals are only set for the benchmark
+        state = PerezVaucher.SolverState(0)
+        state.swap()
+        try:
+            PerezVaucher.cities = instance
+            PerezVaucher.build_distances(instance)
+            rng = np.random.default_rng(0)
+            for name, (call, setup) in calls(n, rng).items():
+                if name in selected:
+                    results['%s n=%d' % (name, n)] = elapsed = measure(call, setup)
+                    print('%-20s n=%-7d %12.3f us' % (name, n, 1e6 * elapsed))
+                    sys.stdout.flush()
+        finally:
+            state.swap()
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the solver functions')
+    parser.add_argument('--sizes', default=','.join(map(str, sizes)), help='quantities of cities, comma separated')
+    parser.add_argument('--repeat', type=int, default=repeat, help='measures of each function (the median is kept)')
+    parser.add_argument('--json', default=None, help='file where the times are written')
+    parser.add_argument('--save-baseline', default=None, help='file where the times are saved as baseline')
+    parser.add_argument('--baseline', default=None, help='baseline file the times are compared with')
+    parser.add_argument('--tolerance', type=float, default=tolerance,
+                        help='slowdown above which a function regresses, in share of its baseline')
+    parser.add_argument('--floor', type=float, default=floor,
+                        help='slowdown below which a function does not regress, in seconds')
+    parser.add_argument('function', nargs='*', default=functions)
+    args = parser.parse_args()
+    repeat = args.repeat
+
+    results = run(args.function, [int(n) for n in args.sizes.split(',')])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        baseline.save(args.save_baseline, results)
+    if args.baseline and not baseline.check(results, args.baseline, args.tolerance, args.floor):
+        sys.exit(1)
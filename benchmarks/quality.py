@@ -0,0 +1,106 @@
+"""
+    Quality versus time of the solver: the best length found along the time, on data files and generated instances.
+
+    An instance is a file of cities, or distribution-n for n cities generated with seed 0 (see data/generate_cities.py):
+    uniform-200, clustered-500, grid-400... Each test instance:maxtime is solved with solve_iter by several seeds, in
+    this process. The length at a checkpoint (a share of maxtime) is the one of the last improvement before it.
+
+    The curves (mean length at each checkpoint) are printed, and the improvements of every run can be written as CSV.
+    With --save-baseline, the mean final lengths are saved; with --baseline, they are compared with the saved ones and
+    the benchmark fails (exit status 1) if one of them is more than --tolerance longer (see baseline). The lengths at
+    the other checkpoints depend too much on the load of the machine to be compared.
+
+    Usage: quality.py [-t INSTANCE:MAXTIME ...] [--seeds N] [--csv FILE] [--save-baseline FILE] [--baseline FILE]
+                      [--tolerance SHARE]
+"""
+import csv
+import os
+import statistics
+import sys
+
+import numpy as np
+
+import baseline
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'data'))
+
+import generate_cities
+import instances
+import PerezVaucher
+
+# Tests as (instance, maxtime in seconds)
+tests = (('data/pb100.txt', 5), ('uniform-200', 10), ('clustered-200', 10), ('grid-196', 5))
+# Seeds (runs) of each test
+seeds = 3
+# Checkpoints of the curves, in share of maxtime
+checkpoints = (0.1, 0.25, 0.5, 0.75, 1)
+# Lengthening above which a test regresses, in share of its baseline
+tolerance = 1 / 100
+
+
+def load(name):
+    """
+    Return the instance of a file, or generated from its distribution-n name
+    """
+    if os.path.exists(name) or os.path.exists(os.path.join(root, name)):
+        return instances.load(name if os.path.exists(name) else os.path.join(root, name))
+    distribution, n = name.rsplit('-', 1)
+    coordinates = generate_cities.generate(int(n), distribution, 0, max(generate_cities.MAX_X, int(n)))
+    return instances.Instance(np.arange(int(n)).astype(str), coordinates.astype(np.float64))
+
+
+def run(name, maxtime, seed):
+    """
+    Return the improvements of a run, as (elapsed seconds, length)
+    """
+    return [(improvement.elapsed, improvement.length)
+            for improvement in PerezVaucher.solve_iter(load(name), False, maxtime, seed=seed)]
+
+
+def length_at(improvements, elapsed):
+    """
+    Return the length of the last improvement before the elapsed time (the first one if there is none)
+    """
+    before = [length for t, length in improvements if t <= elapsed]
+    return before[-1] if before else improvements[0][1]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Quality versus time of the solver')
+    parser.add_argument('-t', '--test', action='append', help='test as instance:maxtime')
+    parser.add_argument('--seeds', type=int, default=seeds, help='runs of each test')
+    parser.add_argument('--csv', default=None, help='file where the improvements of every run are written')
+    parser.add_argument('--save-baseline', default=None, help='file where the mean final lengths are saved as baseline')
+    parser.add_argument('--baseline', default=None, help='baseline file the mean final lengths are compared with')
+    parser.add_argument('--tolerance', type=float, default=tolerance,
+                        help='lengthening above which a test regresses, in share of its baseline')
+    args = parser.parse_args()
+    if args.test:
+        tests = tuple((t.rsplit(':', 1)[0], float(t.rsplit(':', 1)[1])) for t in args.test)
+
+    results = {}
+    rows = []
+    print('%-20s' % 'test' + ''.join('%10g' % share for share in checkpoints) + '  (share of maxtime)')
+    for name, maxtime in tests:
+        runs = [run(name, maxtime, seed) for seed in range(0, args.seeds)]
+        for seed, improvements in enumerate(runs):
+            rows.extend((name, maxtime, seed, elapsed, length) for elapsed, length in improvements)
+        curve = [statistics.mean(length_at(improvements, share * maxtime) for improvements in runs)
+                 for share in checkpoints]
+        results['%s:%g' % (name, maxtime)] = curve[-1]
+        print('%-20s' % ('%s:%g' % (name, maxtime)) + ''.join('%10.1f' % length for length in curve))
+        sys.stdout.flush()
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['test', 'maxtime', 'seed', 'elapsed', 'length'])
+            writer.writerows(rows)
+    if args.save_baseline:
+        baseline.save(args.save_baseline, results)
+    if args.baseline and not baseline.check(results, args.baseline, args.tolerance):
+        sys.exit(1)
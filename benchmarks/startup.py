@@ -0,0 +1,68 @@
+"""
+    Startup time benchmark of the solver, guarding against import time regressions.
+
+    Every process of PVC-tester and every island imports the solver module, so its import time is paid by each of
+    them. Each module is imported in a new interpreter, repeat times, and the best time is compared to the import
+    of numpy alone, which the solver can't avoid. The benchmark fails (exit status 1) if a module imports one of
+    the forbidden modules, or takes more than max_overhead seconds longer to import than numpy.
+
+    Usage: startup.py [--repeat N] [--max-overhead SECONDS] [module ...]
+"""
+import os
+import subprocess
+import sys
+
+# Modules imported by the benchmark (by default)
+modules = ('PerezVaucher', 'validation', 'instances')
+# Modules which must not be imported without GUI
+forbidden_modules = ('pygame',)
+# Imports of each module
+repeat = 7
+# Maximal import time of a module, in seconds, above the import time of numpy
+max_overhead = 0.1
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+measure = '''
+import sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(elapsed, ' '.join(m for m in %r if m in sys.modules))
+'''
+
+
+def import_time(module):
+    """
+    Return the best import time of the module in a new interpreter, and the forbidden modules it imported
+    """
+    best, imported = float('inf'), []
+    for i in range(0, repeat):
+        output = subprocess.run([sys.executable, '-c', measure % (module, forbidden_modules)], cwd=root,
+                                check=True, capture_output=True, text=True).stdout.splitlines()[-1].split()
+        best, imported = min(best, float(output[0])), output[1:]
+    return best, imported
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import time of the solver modules')
+    parser.add_argument('--repeat', type=int, default=repeat, help='imports of each module (the best is kept)')
+    parser.add_argument('--max-overhead', type=float, default=max_overhead,
+                        help='maximal import time of a module above the one of numpy, in seconds')
+    parser.add_argument('module', nargs='*', default=modules)
+    args = parser.parse_args()
+    repeat = args.repeat
+
+    reference, imported = import_time('numpy')
+    print('%-16s %8.1f ms' % ('numpy', 1000 * reference))
+    failed = False
+    for module in args.module:
+        elapsed, imported = import_time(module)
+        errors = ['imports %s' % m for m in imported]
+        if elapsed - reference > args.max_overhead:
+            errors.append('%.1f ms over numpy' % (1000 * (elapsed - reference)))
+        failed = failed or bool(errors)
+        print('%-16s %8.1f ms %s' % (module, 1000 * elapsed, 'FAILED: ' + ', '.join(errors) if errors else 'OK'))
+    sys.exit(1 if failed else 0)
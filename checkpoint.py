@@ -0,0 +1,53 @@
+"""
+    Checkpoints of the genetic algorithm.
+
+    A checkpoint is a .npz file with the population (tours stored with the smallest integer type able to hold
+    the city indexes, and scores), the generation counters, the fittest solution, the states of the random
+    generators and a fingerprint of the coordinates of the instance, so that it is not resumed on another one.
+    It is written to a temporary file which then replaces the previous checkpoint, so a checkpoint is always complete.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def fingerprint(coordinates):
+    """
+    Return a hash of the coordinates of the cities, in their order
+    """
+    return hashlib.sha1(np.ascontiguousarray(coordinates, dtype=np.float64).tobytes()).hexdigest()
+
+
+def save(filename, coordinates, population, gen, gen_without_better_solution, fittest, python_random, numpy_rng):
+    """
+    Save the state of the genetic algorithm, with the states of the python random module and numpy generator given
+    """
+    dtype = np.min_scalar_type(max(len(coordinates) - 1, 0))
+    state = {'gen': gen, 'gen_without_better_solution': gen_without_better_solution,
+             'python_random': python_random.getstate(), 'numpy_rng': numpy_rng.bit_generator.state,
+             'fingerprint': fingerprint(coordinates)}
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez(f, tours=population[0].astype(dtype), scores=population[1],
+                 fittest_tour=fittest[0].astype(dtype), fittest_score=np.float64(fittest[1]),
+                 state=np.frombuffer(json.dumps(state).encode(), dtype=np.uint8))
+    os.replace(temporary, filename)
+
+
+def load(filename, coordinates):
+    """
+    Load a checkpoint saved for the same cities.
+    Return the population, the generation counters, the fittest solution and the states of the random generators
+    (to give to random.setstate and to the bit_generator.state of a numpy generator).
+    """
+    with np.load(filename) as data:
+        state = json.loads(data['state'].tobytes().decode())
+        if state['fingerprint'] != fingerprint(coordinates):
+            raise ValueError('%s is a checkpoint of another instance' % filename)
+        population = [data['tours'].astype(np.intp), data['scores'].copy()]
+        fittest = [data['fittest_tour'].astype(np.intp), float(data['fittest_score'])]
+    python_random = state['python_random']
+    python_random = (python_random[0], tuple(python_random[1]), python_random[2])
+    return population, state['gen'], state['gen_without_better_solution'], fittest, python_random, state['numpy_rng']
@@ -0,0 +1,251 @@
+"""
+    Constructive heuristics for the travelling salesman problem, used to seed the initial population.
+
+    Each heuristic takes a random generator, so that several calls give different tours:
+    - nearest: nearest neighbour tour from a random start city
+    - greedy: greedy edge matching on the neighbour lists, with slightly perturbed lengths
+    - hilbert: order of the cities along a Hilbert space-filling curve, randomly rotated
+    - insertion: cheapest insertion of the cities in a random order
+"""
+import math
+
+import numpy as np
+
+# Order of the Hilbert curve (the plane is divided in 2^order x 2^order cells)
+hilbert_order = 16
+# Relative noise applied to the edge lengths by the greedy heuristic
+greedy_noise = 5 / 100
+
+
+def build_tour(strategy, coordinates, neighbours, rng):
+    """
+    Return a tour built with the given strategy ('nearest', 'greedy', 'hilbert' or 'insertion')
+    """
+    if strategy == 'nearest':
+        return nearest_neighbour_tour(coordinates, rng)
+    if strategy == 'greedy':
+        return greedy_edge_tour(coordinates, neighbours, rng)
+    if strategy == 'hilbert':
+        return hilbert_tour(coordinates, rng)
+    if strategy == 'insertion':
+        return insertion_tour(coordinates, neighbours, rng)
+    raise ValueError('Unknown seeding strategy %r' % strategy)
+
+
+def nearest_neighbour_tour(coordinates, rng):
+    """
+    Return the tour going from a random city to the nearest unvisited city, until all cities are visited.
+    Unvisited cities are kept in a grid, searched in growing squares around the current city.
+    """
+    n = len(coordinates)
+    xs = coordinates[:, 0].tolist()
+    ys = coordinates[:, 1].tolist()
+    low = coordinates.min(axis=0)
+    extent = max(float((coordinates.max(axis=0) - low).max()), 1e-9)
+    side = max(1, int(math.sqrt(n / 2)))
+    cell_size = extent / side
+    cells_xy = np.minimum(((coordinates - low) / cell_size).astype(np.intp), side - 1).tolist()
+    cells = {}
+    for i, (cx, cy) in enumerate(cells_xy):
+        cells.setdefault((cx, cy), set()).add(i)
+    unvisited = np.ones(n, dtype=bool)
+
+    current = int(rng.integers(0, n))
+    tour = [current]
+    for step in range(1, n):
+        cells[tuple(cells_xy[current])].discard(current)
+        unvisited[current] = False
+        cx, cy = cells_xy[current]
+        nearest, nearest_distance = -1, math.inf
+        radius = 0
+        # Search in growing squares while it is cheaper than looking at all the remaining cities
+        while (2 * radius + 1) ** 2 <= 4 * (n - step):
+            for x in range(cx - radius, cx + radius + 1):
+                for y in range(cy - radius, cy + radius + 1):
+                    if max(abs(x - cx), abs(y - cy)) != radius:
+                        continue
+                    for c in cells.get((x, y), ()):
+                        d = math.hypot(xs[c] - xs[current], ys[c] - ys[current])
+                        if d < nearest_distance:
+                            nearest, nearest_distance = c, d
+            # Every city closer than radius cells has been seen
+            if nearest >= 0 and nearest_distance <= radius * cell_size:
+                break
+            radius += 1
+        else:
+            remaining = np.flatnonzero(unvisited)
+            delta = coordinates[remaining] - coordinates[current]
+            nearest = int(remaining[np.argmin((delta * delta).sum(axis=1))])
+        current = nearest
+        tour.append(current)
+    return np.array(tour, dtype=np.intp)
+
+
+def greedy_edge_tour(coordinates, neighbours, rng):
+    """
+    Return the tour built by adding the shortest edges of the neighbour lists first, as long as no city gets
+    more than two edges and no cycle is closed. The fragments left are then joined from nearest end to nearest end.
+    """
+    n = len(coordinates)
+    if n < 3:
+        return np.arange(n, dtype=np.intp)
+    a = np.repeat(np.arange(n), neighbours.shape[1])
+    b = neighbours.ravel()
+    delta = coordinates[a] - coordinates[b]
+    lengths = np.sqrt((delta * delta).sum(axis=1)) * (1 + greedy_noise * rng.random(len(a)))
+    order = np.argsort(lengths, kind='stable')
+
+    links = [[] for i in range(n)]
+    parent = list(range(n))
+
+    def root(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    for u, v in zip(a[order].tolist(), b[order].tolist()):
+        if len(links[u]) < 2 and len(links[v]) < 2:
+            ru, rv = root(u), root(v)
+            if ru != rv:
+                parent[ru] = rv
+                links[u].append(v)
+                links[v].append(u)
+
+    # Walk the fragments, jumping from the end of a fragment to the nearest end of another one
+    visited = np.zeros(n, dtype=bool)
+    ends = np.array([c for c in range(n) if len(links[c]) < 2], dtype=np.intp)
+    tour = []
+    current = int(ends[0])
+    while True:
+        previous = -1
+        while True:
+            tour.append(current)
+            visited[current] = True
+            following = [c for c in links[current] if c != previous and not visited[c]]
+            if not following:
+                break
+            previous, current = current, following[0]
+        ends = ends[~visited[ends]]
+        if len(ends) == 0:
+            break
+        delta = coordinates[ends] - coordinates[current]
+        current = int(ends[np.argmin((delta * delta).sum(axis=1))])
+    return np.array(tour, dtype=np.intp)
+
+
+def hilbert_indexes(coordinates, order=hilbert_order):
+    """
+    Return the position of each city along a Hilbert curve covering the bounding square of the cities
+    """
+    side = 1 << order
+    low = coordinates.min(axis=0)
+    extent = max(float((coordinates.max(axis=0) - low).max()), 1e-9)
+    scaled = ((coordinates - low) / extent * (side - 1)).astype(np.int64)
+    x, y = scaled[:, 0].copy(), scaled[:, 1].copy()
+    indexes = np.zeros(len(coordinates), dtype=np.int64)
+    s = side // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        indexes += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotate the quadrant so that the curve is continuous
+        flip = ~ry & rx
+        x[flip] = side - 1 - x[flip]
+        y[flip] = side - 1 - y[flip]
+        swap = ~ry
+        x[swap], y[swap] = y[swap], x[swap].copy()
+        s //= 2
+    return indexes
+
+
+def hilbert_tour(coordinates, rng):
+    """
+    Return the cities in the order of a Hilbert curve, the plane being first rotated by a random angle
+    """
+    angle = rng.random() * 2 * math.pi
+    rotation = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+    return np.argsort(hilbert_indexes(coordinates @ rotation), kind='stable').astype(np.intp)
+
+
+def insertion_tour(coordinates, neighbours, rng):
+    """
+    Return the tour built by inserting the cities in a random order, each one where it lengthens the tour the least
+    """
+    n = len(coordinates)
+    order = rng.permutation(n)
+    if n < 3:
+        return order.astype(np.intp)
+    return cheapest_insertion(coordinates, neighbours, order[:3], order[3:])
+
+
+def cheapest_insertion(coordinates, neighbours, tour, cities):
+    """
+    Return the tour with the cities inserted in their order, each one where it lengthens the tour the least.
+    Only the edges of the already inserted neighbours of the city are considered, or if there is none, the edges of
+    as many nearest inserted cities, found in a grid of about 2 cities per cell searched in growing rings of cells.
+    """
+    n = len(coordinates)
+    xs = coordinates[:, 0].tolist()
+    ys = coordinates[:, 1].tolist()
+    near = neighbours.tolist()
+    tour = [int(c) for c in tour]
+    cities = [int(c) for c in cities]
+    if not tour:
+        if not cities:
+            return np.array([], dtype=np.intp)
+        tour, cities = cities[:1], cities[1:]
+
+    def dist(c1, c2):
+        return math.hypot(xs[c1] - xs[c2], ys[c1] - ys[c2])
+
+    low = coordinates.min(axis=0)
+    extent = max(float((coordinates.max(axis=0) - low).max()), 1e-9)
+    side = max(1, int(math.sqrt(n / 2)))
+    cell_size = extent / side
+    cells_xy = np.minimum(((coordinates - low) / cell_size).astype(np.intp), side - 1).tolist()
+    cells = {}
+    for c in tour:
+        cells.setdefault(tuple(cells_xy[c]), []).append(c)
+
+    def nearest_inserted(city, k):
+        # The k nearest inserted cities (or all of them if there are fewer)
+        cx, cy = cells_xy[city]
+        found = []
+        radius = 0
+        while radius <= side:
+            if radius == 0:
+                ring = [(cx, cy)]
+            else:
+                ring = [(x, y) for x in range(cx - radius, cx + radius + 1) for y in (cy - radius, cy + radius)] + \
+                       [(x, y) for y in range(cy - radius + 1, cy + radius) for x in (cx - radius, cx + radius)]
+            found.extend((dist(city, u), u) for cell in ring for u in cells.get(cell, ()))
+            # The cities of the next rings are farther than radius cells
+            if len(found) >= k:
+                found.sort()
+                del found[k:]
+                if found[-1][0] <= radius * cell_size:
+                    break
+            radius += 1
+        return [u for d, u in found]
+
+    succ = np.full(n, -1, dtype=np.intp)
+    succ[tour] = np.roll(tour, -1)
+    pred = dict(zip(tour, np.roll(tour, 1).tolist()))
+    for city in cities:
+        candidates = [u for u in near[city] if u in pred] or nearest_inserted(city, max(len(near[city]), 1))
+        best, best_cost = -1, math.inf
+        for u in candidates:
+            for v, w in ((u, int(succ[u])), (pred[u], u)):
+                cost = dist(v, city) + dist(city, w) - dist(v, w)
+                if cost < best_cost:
+                    best, best_cost = v, cost
+        following = int(succ[best])
+        succ[best], succ[city] = city, following
+        pred[city], pred[following] = best, city
+        cells.setdefault(tuple(cells_xy[city]), []).append(city)
+
+    result = [tour[0]]
+    for i in range(1, len(pred)):
+        result.append(int(succ[result[-1]]))
+    return np.array(result, dtype=np.intp)
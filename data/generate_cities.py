@@ -1,35 +1,90 @@
 # coding: latin-1
 
-"""Un script quick-and-dirty pour gnrer des problmes du voyageur de commerce.
+"""Gnrateur de problmes du voyageur de commerce.
 
-Usage: generate_cities <nombre> <fichier>
+Usage: generate_cities <nombre> <fichier> [--distribution uniform|clustered|grid] [--seed GRAINE]
+                       [--max MAX] [--tsplib]
 
-Va gnrer <nombre> couple de nombres et le mettre dans <fichier> au format
+Va gnrer <nombre> villes et les mettre dans <fichier> au format
 v1 x1 y2
 v2 x2 y2
 ...
+ou au format TSPLIB (EUC_2D) avec --tsplib. Les coordonnes sont des entiers entre 0 et MAX
+(par dfaut 500, ou <nombre> s'il est plus grand, pour limiter les villes superposées).
+
+Les villes sont gnres d'un bloc avec numpy (quelques secondes pour des millions de villes),  partir de la
+graine si elle est donne:
+- uniform: uniformment dans le carr
+- clustered: autour de centres tirs uniformment, environ cluster_size villes par centre
+- grid: aux noeuds d'une grille rgulire, ligne par ligne
 
 Attention! script sans garantie! notamment, si <fichier> existe, IL SERA ECRAS!!!
 
-""" 
+"""
 
 
+import argparse
 import sys
-from random import randint
+
+import numpy as np
 
 MAX_X = MAX_Y = 500
 
-try:
-    filename = sys.argv[2]
-    nb = int(sys.argv[1])
-except:
-    print (__doc__)
-    sys.exit(1)
+# Nombre moyen de villes autour de chaque centre des instances clustered
+cluster_size = 100
+# Lignes crites  la fois
+chunk_size = 100000
+
+
+def generate(nb, distribution='uniform', seed=None, size=MAX_X):
+    """Retourne les coordonnes entires de nb villes (tableau nb x 2) dans le carr [0, size]"""
+    rng = np.random.default_rng(seed)
+    if distribution == 'uniform':
+        points = rng.random((nb, 2)) * (size + 1)
+    elif distribution == 'clustered':
+        clusters = max(1, nb // cluster_size)
+        centers = rng.random((clusters, 2)) * size
+        spread = size / (4 * np.sqrt(clusters))
+        points = centers[rng.integers(0, clusters, nb)] + rng.normal(0, spread, (nb, 2))
+    elif distribution == 'grid':
+        side = max(1, int(np.ceil(np.sqrt(nb))))
+        step = size / max(side - 1, 1)
+        index = np.arange(nb)
+        points = np.stack((index % side, index // side), axis=1) * step
+    else:
+        raise ValueError('distribution inconnue: %r' % distribution)
+    return np.clip(np.floor(points), 0, size).astype(np.int64)
+
+
+def write(filename, coordinates, tsplib=False):
+    """crit les villes dans le fichier, au format des fichiers data/pbXXX.txt ou TSPLIB"""
+    with open(filename, "w") as f:
+        if tsplib:
+            f.write("NAME : %s\nTYPE : TSP\nDIMENSION : %d\nEDGE_WEIGHT_TYPE : EUC_2D\nNODE_COORD_SECTION\n"
+                    % (filename, len(coordinates)))
+            line, first = "%d %d %d\n", 1
+        else:
+            line, first = "v%d %d %d\n", 0
+        for start in range(0, len(coordinates), chunk_size):
+            chunk = coordinates[start:start + chunk_size]
+            rows = np.column_stack((np.arange(start + first, start + first + len(chunk)), chunk)).tolist()
+            f.write("".join(line % tuple(row) for row in rows))
+        if tsplib:
+            f.write("EOF\n")
 
-f = open(filename, "w")
 
-for i in range(nb):
-    line = "v%d %d %d\n" % (i, randint(0,MAX_X), randint(0,MAX_Y))
-    f.write(line)
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Gnrateur de problmes du voyageur de commerce")
+    parser.add_argument('nb', type=int)
+    parser.add_argument('filename')
+    parser.add_argument('--distribution', choices=('uniform', 'clustered', 'grid'), default='uniform')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max', type=int, default=None)
+    parser.add_argument('--tsplib', action='store_true')
+    args = parser.parse_args()
 
-f.close()
\ No newline at end of file
+    size = max(MAX_X, args.nb) if args.max is None else args.max
+    write(args.filename, generate(args.nb, args.distribution, args.seed, size), args.tsplib)
@@ -0,0 +1,88 @@
+"""
+    Decomposition of big instances: the cities are partitioned in small spatial clusters solved separately,
+    the clusters are ordered by a tour of their centroids, and their tours are stitched in that order.
+
+    - partition: recursive bisection of the cities at the median of the widest side of their bounding box,
+      until the clusters have at most cluster_size cities (a k-d tree, whose leaves are the clusters)
+    - cluster_order: tour of the centroids of the clusters (nearest neighbour and local search)
+    - stitch: each cluster tour is opened at the edge, and in the direction, which connects it the most cheaply
+      to the end of the previous one
+    - boundary_cities: cities with a near neighbour in another cluster, where the local search should start
+"""
+import numpy as np
+
+import construction
+import localsearch
+
+# Maximal quantity of cities of a cluster
+cluster_size = 200
+
+
+def partition(coordinates, size=cluster_size):
+    """
+    Return the clusters of at most size cities, as arrays of city indexes, in the order of the bisections
+    """
+    clusters = []
+    pending = [np.arange(len(coordinates))]
+    while pending:
+        cities = pending.pop()
+        if len(cities) <= size:
+            clusters.append(cities)
+            continue
+        points = coordinates[cities]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        half = len(cities) // 2
+        split = np.argpartition(points[:, axis], half)
+        pending.append(cities[split[half:]])
+        pending.append(cities[split[:half]])
+    return clusters
+
+
+def cluster_order(coordinates, clusters, rng):
+    """
+    Return the order in which the clusters are visited, as a tour of their centroids
+    """
+    centroids = np.array([coordinates[cluster].mean(axis=0) for cluster in clusters])
+    if len(clusters) < 5:
+        return np.arange(len(clusters))
+    tour = construction.nearest_neighbour_tour(centroids, rng)
+    return localsearch.local_search(tour, centroids, localsearch.neighbour_lists(centroids))
+
+
+def stitch(coordinates, tours):
+    """
+    Return the tour going through the tours of cities in their order.
+    Each tour is entered at the city, and in the direction, minimizing the distance from the end of the previous tour
+    minus the length of the edge removed to open it.
+    """
+    # The first tour is entered as if coming from the last one
+    end = coordinates[tours[-1]].mean(axis=0)
+    parts = []
+    for tour in tours:
+        if len(tour) < 2:
+            parts.append(tour)
+            end = coordinates[tour[-1]]
+            continue
+        following = np.roll(tour, -1)
+        edges = np.sqrt(((coordinates[tour] - coordinates[following]) ** 2).sum(axis=1))
+        # Forward: enter at following[i] and leave at tour[i]; backward: enter at tour[i] and leave at following[i]
+        forward = np.sqrt(((coordinates[following] - end) ** 2).sum(axis=1)) - edges
+        backward = np.sqrt(((coordinates[tour] - end) ** 2).sum(axis=1)) - edges
+        i = int(np.argmin(np.minimum(forward, backward)))
+        if forward[i] <= backward[i]:
+            part = np.roll(tour, -(i + 1))
+        else:
+            part = np.roll(tour[::-1], i + 1 - len(tour))
+        parts.append(part)
+        end = coordinates[part[-1]]
+    return np.concatenate(parts).astype(np.intp)
+
+
+def boundary_cities(clusters, neighbours, n):
+    """
+    Return the cities having one of their neighbours in another cluster
+    """
+    labels = np.empty(n, dtype=np.intp)
+    for i, cluster in enumerate(clusters):
+        labels[cluster] = i
+    return np.flatnonzero((labels[neighbours] != labels[:, np.newaxis]).any(axis=1))
@@ -0,0 +1,167 @@
+"""
+    Display of the cities and of the tours with pygame, imported only when a GUI is requested.
+
+    The solver doesn't draw itself: a Renderer process owns the window and draws the last solution published by
+    the solver. The cities can also be placed with the mouse before solving (cities_by_mouse).
+"""
+import multiprocessing
+import sys
+
+import numpy as np
+import pygame
+from pygame.locals import KEYDOWN, QUIT, MOUSEBUTTONDOWN, K_RETURN
+
+import instances
+
+screen = None
+city_color = (10, 10, 200)  # blue
+summary_color = (255, 255, 255)  # white
+city_font_size = 16  # pixels
+summary_font_size = 26  # pixels
+screen_size = (500, 500)
+city_radius = 2
+city_font = None
+summary_font = None
+# Rendered names of the cities, with their rectangles, in the order of the cities
+city_labels = []
+# Maximal frames per second drawn by the renderer process
+gui_fps = 10
+# Cities of the window (instances.Instance)
+cities = None
+
+
+def draw_cities(tour=None, connected=False, generation=-1, distance=-1):
+    """Draw the cities of the tour (array of indexes, all the cities if None) to the GUI"""
+    # GUI mode selected
+    if screen is not None:
+        if tour is None:
+            tour = range(0, len(cities))
+        # Names are rendered once, cities can only be added (with the mouse)
+        for c in range(len(city_labels), len(cities)):
+            text = city_font.render(cities.name(c), True, city_color, (0, 0, 0))
+            textrect = text.get_rect()
+            textrect.center = tuple(cities.coordinates[c])
+            city_labels.append((text, textrect))
+        screen.fill(0)
+        screen.blits([city_labels[c] for c in tour], False)
+
+        if connected:
+            pygame.draw.lines(screen, city_color, True, cities.coordinates[tour].tolist())
+
+        if generation != -1 and distance != -1:
+            text = city_font.render('Generation n°' + str(generation) + '; Distance = ' + str(round(distance, 2)), True,
+                                    summary_color, (0, 0, 0))
+            textrect = text.get_rect()
+            textrect.centerx = screen_size[0] / 2.0
+            textrect.centery = screen_size[1] - summary_font_size / 4.0
+            screen.blit(text, textrect)
+
+        pygame.display.flip()
+
+
+def setup_gui():
+    """Initialize the GUI"""
+    global screen, city_font, summary_font
+    pygame.init()
+    city_font = pygame.font.SysFont(None, city_font_size)
+    summary_font = pygame.font.SysFont(None, summary_font_size)
+    pygame.display.set_mode(screen_size)
+    pygame.display.set_caption('TSP by Alexandre Perez and Sébastien Vaucher')
+    screen = pygame.display.get_surface()
+
+
+def cities_by_mouse():
+    """Ask the user to set the locations of cities with his mouse, and return them (instances.Instance)"""
+    global screen, cities, city_labels
+    # The window is only used for that, the solutions are then shown by the renderer process
+    setup_gui()
+
+    collecting = True
+    names = []
+    positions = []
+    cities = instances.Instance(np.array(names, dtype=str), np.zeros((0, 2)))
+    while collecting:
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                sys.exit(0)
+            elif event.type == KEYDOWN and event.key == K_RETURN:
+                collecting = False
+            elif event.type == MOUSEBUTTONDOWN:
+                names.append('v' + str(len(names)))
+                positions.append(pygame.mouse.get_pos())
+                cities = instances.Instance(np.array(names), np.array(positions, dtype=np.float64))
+                draw_cities()
+
+    pygame.quit()
+    screen = None
+    city_labels = []
+    return cities
+
+
+class Renderer:
+    """
+    Window drawn by a separate process, so that drawing doesn't slow down the solver.
+    The solver publishes its best solution in shared memory, which holds only the last one (older ones are
+    overwritten), and the renderer draws it at most gui_fps times per second.
+    """
+
+    def __init__(self, cities):
+        self.lock = multiprocessing.Lock()
+        self.tour = multiprocessing.RawArray('q', max(len(cities), 1))
+        # Version of the snapshot, generation, distance, and 1 if the tour is connected
+        self.header = multiprocessing.RawArray('d', 4)
+        self.closed = multiprocessing.Event()
+        self.stopped = multiprocessing.Event()
+        self.published = None
+        self.process = multiprocessing.Process(target=render_loop, daemon=True,
+                                               args=(cities, self.lock, self.tour, self.header, self.closed,
+                                                     self.stopped))
+        self.process.start()
+
+    def publish(self, tour=None, connected=False, generation=-1, distance=-1):
+        """
+        Replace the snapshot to draw. The tour is only copied if it is another array than the previous one.
+        """
+        with self.lock:
+            if tour is not None and tour is not self.published:
+                np.frombuffer(self.tour, dtype=np.int64)[:len(tour)] = tour
+                self.published = tour
+            self.header[0] += 1
+            self.header[1:] = [generation, distance, 1 if connected and tour is not None else 0]
+
+    def close(self):
+        """
+        Stop the renderer once the last snapshot is drawn
+        """
+        self.stopped.set()
+        self.process.join()
+
+
+def render_loop(instance, lock, shared_tour, header, closed, stopped):
+    """
+    Process of the renderer: draw the last published snapshot at most gui_fps times per second and handle the
+    window events, until stopped is set or the window is closed (which sets closed)
+    """
+    global cities
+    cities = instance
+    setup_gui()
+    clock = pygame.time.Clock()
+    tour = np.arange(len(cities))
+    version = -1
+    draw_cities()
+    while True:
+        stopping = stopped.is_set()
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                closed.set()
+                pygame.quit()
+                return
+        if header[0] != version:
+            with lock:
+                version, generation, distance, connected = header[:]
+                tour[:] = np.frombuffer(shared_tour, dtype=np.int64)[:len(tour)]
+            draw_cities(tour, connected == 1, int(generation), distance)
+        if stopping:
+            break
+        clock.tick(gui_fps)
+    pygame.quit()
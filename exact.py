@@ -0,0 +1,212 @@
+"""
+    Exact solvers for small instances of the travelling salesman problem.
+
+    - held_karp: dynamic programming over the subsets of cities (bitmasks), vectorized over all the subsets of the
+      same size. Time in O(2^n n^2) and memory in O(2^n n), so it is used up to held_karp_max_cities cities.
+    - branch_and_bound: depth-first search of the paths from the first city, nearest cities first, starting from
+      the tour of the local search. A path is cut as soon as its length, plus a minimum spanning tree of the cities
+      left and their cheapest connections to both ends of the path, is not shorter than the best tour. The bound
+      uses distances penalized by the Held-Karp penalties of the cities, computed once by subgradient ascent.
+      It is used up to branch_and_bound_max_cities cities, and can be stopped at a deadline, in which case its best
+      tour isn't proven optimal.
+"""
+import time
+
+import numpy as np
+
+import construction
+import localsearch
+
+# Held-Karp is used up to this quantity of cities
+held_karp_max_cities = 16
+# The branch and bound is used up to this quantity of cities
+branch_and_bound_max_cities = 30
+# Iterations of the subgradient ascent of the penalties of the branch and bound bound
+penalty_iterations = 100
+# Time limit of the branch and bound without deadline, in seconds
+branch_and_bound_time_limit = 10
+
+
+def distance_matrix(coordinates):
+    """
+    Return the matrix of the distances between all the cities
+    """
+    delta = coordinates[:, np.newaxis, :] - coordinates[np.newaxis, :, :]
+    return np.sqrt((delta * delta).sum(axis=2))
+
+
+def solve(coordinates, deadline=None):
+    """
+    Solve the instance with the exact solver suited to its size.
+    Return the tour, and True if it is proven optimal (False if the deadline stopped the branch and bound)
+    """
+    if len(coordinates) <= held_karp_max_cities:
+        return held_karp(coordinates), True
+    if deadline is None:
+        deadline = time.time() + branch_and_bound_time_limit
+    return branch_and_bound(coordinates, deadline)
+
+
+def held_karp(coordinates):
+    """
+    Return an optimal tour, starting at the first city.
+    length[S, j] is the length of the shortest path from city 0 visiting the cities of S (bit i for city i + 1)
+    and ending at city j + 1. The subsets are computed by increasing size, one last city at a time for all the
+    subsets of a size together.
+    """
+    n = len(coordinates)
+    if n <= 3:
+        return np.arange(n, dtype=np.intp)
+    d = distance_matrix(coordinates)
+    m = n - 1
+    subsets = np.arange(1 << m)
+    sizes = np.zeros(1 << m, dtype=np.intp)
+    for i in range(0, m):
+        sizes += (subsets >> i) & 1
+    length = np.full((1 << m, m), np.inf)
+    previous = np.zeros((1 << m, m), dtype=np.int8)
+    length[1 << np.arange(m), np.arange(m)] = d[0, 1:]
+    for size in range(2, m + 1):
+        layer = subsets[sizes == size]
+        for j in range(0, m):
+            ending = layer[(layer >> j) & 1 == 1]
+            candidates = length[ending ^ (1 << j)] + d[1:, j + 1]
+            best = np.argmin(candidates, axis=1)
+            length[ending, j] = candidates[np.arange(len(ending)), best]
+            previous[ending, j] = best
+
+    full = (1 << m) - 1
+    last = int(np.argmin(length[full] + d[1:, 0]))
+    tour = []
+    subset = full
+    while subset:
+        tour.append(last + 1)
+        subset, last = subset ^ (1 << last), int(previous[subset, last])
+    tour.append(0)
+    return np.array(tour[::-1], dtype=np.intp)
+
+
+def one_tree_penalties(d, upper, iterations=penalty_iterations):
+    """
+    Return the penalties pi of the cities maximizing the 1-tree bound of the distances d + pi_i + pi_j
+    (Held and Karp), by subgradient ascent from the length of a known tour (upper)
+    """
+    n = len(d)
+    pi = np.zeros(n)
+    best_pi, best_bound = pi, -np.inf
+    step = 2.0
+    for iteration in range(0, iterations):
+        penalized = d + pi[:, np.newaxis] + pi[np.newaxis, :]
+        np.fill_diagonal(penalized, np.inf)
+        # Minimum spanning tree of the cities but the first one, which is linked to its two nearest cities
+        degrees = np.zeros(n, dtype=np.intp)
+        tree = 0.0
+        in_tree = np.zeros(n, dtype=bool)
+        in_tree[:2] = True
+        connection = penalized[1].copy()
+        parent = np.ones(n, dtype=np.intp)
+        connection[:2] = np.inf
+        for k in range(2, n):
+            i = int(np.argmin(connection))
+            tree += connection[i]
+            degrees[i] += 1
+            degrees[parent[i]] += 1
+            in_tree[i] = True
+            closer = penalized[i] < connection
+            connection[closer] = penalized[i][closer]
+            parent[closer] = i
+            connection[in_tree] = np.inf
+        first_edges = np.argsort(penalized[0])[:2]
+        tree += penalized[0, first_edges].sum()
+        degrees[first_edges] += 1
+        degrees[0] = 2
+        bound = tree - 2 * pi.sum()
+        if bound > best_bound:
+            best_pi, best_bound = pi.copy(), bound
+        gradient = degrees - 2
+        if not gradient.any():
+            break
+        pi = pi + step * (upper - bound) / (gradient * gradient).sum() * gradient
+        step *= 0.95
+    return best_pi
+
+
+def branch_and_bound(coordinates, deadline=None):
+    """
+    Return the best tour found by the branch and bound, and True if the search ended before the deadline
+    (the tour is then optimal)
+    """
+    n = len(coordinates)
+    if n <= 3:
+        return np.arange(n, dtype=np.intp), True
+    d = distance_matrix(coordinates)
+    dl = d.tolist()
+    # Other cities sorted by distance from each city
+    d_inf = d + np.diag(np.full(n, np.inf))
+    nearest = np.argsort(d_inf, axis=1)[:, :-1].tolist()
+
+    rng = np.random.default_rng(0)
+    best_tour = localsearch.local_search(construction.nearest_neighbour_tour(coordinates, rng), coordinates,
+                                         localsearch.neighbour_lists(coordinates))
+    best_tour = np.roll(best_tour, -int(np.flatnonzero(best_tour == 0)[0]))
+    best = [float(d[best_tour, np.roll(best_tour, -1)].sum()), best_tour.tolist()]
+
+    visited = [False] * n
+    visited[0] = True
+    path = [0]
+    nodes = [0]
+
+    # The distances are penalized to tighten the bound, which removes the penalties of the cities still to visit
+    pi = one_tree_penalties(d, best[0])
+    penalized = d + pi[:, np.newaxis] + pi[np.newaxis, :]
+    pl = penalized.tolist()
+
+    def bound(last, remaining):
+        # The rest of the tour is a path from the last city to the first one through the remaining cities:
+        # it holds a spanning tree of the remaining cities, an edge from the last city and an edge to the first one
+        tree = 0.0
+        distances = penalized[np.ix_(remaining, remaining)]
+        in_tree = np.zeros(len(remaining), dtype=bool)
+        in_tree[0] = True
+        connection = distances[0].copy()
+        connection[0] = np.inf
+        for k in range(1, len(remaining)):
+            i = int(np.argmin(connection))
+            tree += connection[i]
+            in_tree[i] = True
+            connection = np.minimum(connection, distances[i])
+            connection[in_tree] = np.inf
+        ends = min(pl[last][c] for c in remaining) + min(pl[c][0] for c in remaining)
+        return tree + ends - 2 * pi[remaining].sum() - pi[last] - pi[0]
+
+    def search(last, length):
+        nodes[0] += 1
+        if nodes[0] % 1024 == 0 and deadline is not None and time.time() > deadline:
+            raise TimeoutError
+        if len(path) == n:
+            total = length + dl[last][0]
+            if total < best[0] - 1e-9:
+                best[0], best[1] = total, list(path)
+            return
+        remaining = [c for c in range(1, n) if not visited[c]]
+        if length + bound(last, remaining) >= best[0] - 1e-9:
+            return
+        for c in nearest[last]:
+            if visited[c]:
+                continue
+            if length + dl[last][c] >= best[0] - 1e-9:
+                # The next cities are even further
+                break
+            visited[c] = True
+            path.append(c)
+            search(c, length + dl[last][c])
+            path.pop()
+            visited[c] = False
+
+    try:
+        search(0, 0.0)
+        complete = True
+    except TimeoutError:
+        complete = False
+    return np.array(best[1], dtype=np.intp), complete
+
@@ -0,0 +1,147 @@
+"""
+    Loading of travelling salesman instances.
+
+    Two text formats are read, in bulk, into a N x 2 NumPy array of coordinates plus a table of city names:
+    - the format of the data directory, one city per line: name x y
+    - TSPLIB .tsp files with a NODE_COORD_SECTION (the city names are their numbers)
+
+    Big files are converted once to a binary cache next to them (a .npy file with one record per city),
+    which is memory-mapped by the next loads instead of being parsed again.
+"""
+import os
+
+import numpy as np
+
+# Suffix added to the name of an instance file for its binary cache
+cache_suffix = '.cache.npy'
+# Only files bigger than this size (in bytes) are cached
+cache_min_size = 1024 * 1024
+
+
+class Instance:
+    """
+    Cities of an instance: their names (array of str or bytes) and their coordinates (N x 2 array)
+    """
+
+    def __init__(self, names, coordinates):
+        self.names = names
+        self.coordinates = coordinates
+        self._index = None
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def name(self, city):
+        """
+        Return the name of the city given by its index
+        """
+        name = self.names[city]
+        return name.decode() if isinstance(name, bytes) else str(name)
+
+    def tour_names(self, tour):
+        """
+        Return the list of the names of the cities of the tour of indexes
+        """
+        return [self.name(c) for c in tour]
+
+    @property
+    def index(self):
+        """
+        Dictionary of the indexes of the cities by name, built on first use
+        """
+        if self._index is None:
+            self._index = {self.name(c): c for c in range(0, len(self))}
+        return self._index
+
+
+def load(filename, cache=True):
+    """
+    Load the instance of the file, from its binary cache if it's up to date.
+    If cache is True and the file is big, the cache is written for the next loads.
+    """
+    cache_file = filename + cache_suffix
+    if cache and os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(filename):
+        return load_cache(cache_file)
+    if filename.lower().endswith('.tsp'):
+        instance = parse_tsplib(filename)
+    else:
+        instance = parse_cities(filename)
+    if cache and os.path.getsize(filename) >= cache_min_size:
+        # The cache is only an optimization: a read-only directory or a full disk doesn't prevent the load
+        try:
+            save_cache(instance, cache_file)
+        except OSError:
+            pass
+    return instance
+
+
+def parse_cities(filename):
+    """
+    Parse the file with one city per line: name x y
+    """
+    with open(filename, 'r') as f:
+        tokens = f.read().split()
+    if len(tokens) % 3 != 0:
+        raise ValueError('%s: expected lines of 3 fields (name x y)' % filename)
+    names = np.array(tokens[0::3])
+    coordinates = np.empty((len(names), 2), dtype=np.float64)
+    coordinates[:, 0] = np.array(tokens[1::3], dtype=np.float64)
+    coordinates[:, 1] = np.array(tokens[2::3], dtype=np.float64)
+    return Instance(names, coordinates)
+
+
+def parse_tsplib(filename):
+    """
+    Parse a TSPLIB file with the coordinates of the cities in a NODE_COORD_SECTION
+    """
+    with open(filename, 'r') as f:
+        header = {}
+        for line in f:
+            line = line.strip()
+            if line.startswith('NODE_COORD_SECTION'):
+                break
+            if ':' in line:
+                key, value = line.split(':', 1)
+                header[key.strip().upper()] = value.strip()
+        else:
+            raise ValueError('%s: no NODE_COORD_SECTION' % filename)
+        tokens = f.read().split()
+    if tokens and tokens[-1] == 'EOF':
+        tokens.pop()
+    dimension = int(header.get('DIMENSION', len(tokens) // 3))
+    if len(tokens) < 3 * dimension:
+        raise ValueError('%s: expected %d cities with 2D coordinates' % (filename, dimension))
+    tokens = tokens[:3 * dimension]
+    names = np.array(tokens[0::3])
+    coordinates = np.empty((dimension, 2), dtype=np.float64)
+    coordinates[:, 0] = np.array(tokens[1::3], dtype=np.float64)
+    coordinates[:, 1] = np.array(tokens[2::3], dtype=np.float64)
+    return Instance(names, coordinates)
+
+
+def save_cache(instance, cache_file):
+    """
+    Write the instance as a .npy array of records (name, (x, y)), through a temporary file of this process
+    """
+    names = np.char.encode(np.asarray(instance.names, dtype=str))
+    records = np.empty(len(instance), dtype=[('name', names.dtype), ('xy', np.float64, (2,))])
+    records['name'] = names
+    records['xy'] = instance.coordinates
+    temporary = '%s.%d.tmp' % (cache_file, os.getpid())
+    try:
+        with open(temporary, 'wb') as f:
+            np.save(f, records)
+        os.replace(temporary, cache_file)
+    except OSError:
+        # A partial file (full disk) must not stay behind
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def load_cache(cache_file):
+    """
+    Memory-map the binary cache of an instance
+    """
+    records = np.load(cache_file, mmap_mode='r')
+    return Instance(records['name'], records['xy'])
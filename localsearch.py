@@ -0,0 +1,192 @@
+"""
+    Local search for the travelling salesman problem.
+
+    2-opt and Or-opt moves restricted to the k nearest neighbours of each city, with don't-look bits:
+    a city is only examined again once one of its edges has changed. As a move can also open moves around cities
+    whose edges didn't change, all the cities are examined again until a whole pass makes no move: the search
+    stops in a local optimum for both kinds of moves (or at the deadline).
+"""
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+# Quantity of nearest neighbours considered for each city
+neighbour_quantity = 8
+# Longest segment moved by an Or-opt move
+or_opt_max_length = 3
+
+
+def neighbour_lists(coordinates, k=neighbour_quantity):
+    """
+    Return a N x k array with the k nearest cities of each city, nearest first.
+    Cities are bucketed in a grid of about 2 cities per cell, and for each city the cells around it are searched
+    in growing squares until the k nearest are certainly found.
+    """
+    n = len(coordinates)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.zeros((n, 0), dtype=np.intp)
+    low = coordinates.min(axis=0)
+    extent = max(float((coordinates.max(axis=0) - low).max()), 1e-9)
+    side = max(1, int(math.sqrt(n / 2)))
+    cell_size = extent / side
+    cells_xy = np.minimum(((coordinates - low) / cell_size).astype(np.intp), side - 1)
+    cells = {}
+    for i, (cx, cy) in enumerate(cells_xy.tolist()):
+        cells.setdefault((cx, cy), []).append(i)
+
+    neighbours = np.empty((n, k), dtype=np.intp)
+    for i, (cx, cy) in enumerate(cells_xy.tolist()):
+        radius = 1
+        while True:
+            candidates = [j for x in range(cx - radius, cx + radius + 1) for y in range(cy - radius, cy + radius + 1)
+                          for j in cells.get((x, y), ()) if j != i]
+            covers_all = radius >= side
+            if len(candidates) >= k:
+                delta = coordinates[candidates] - coordinates[i]
+                lengths = np.sqrt((delta * delta).sum(axis=1))
+                nearest = np.argsort(lengths, kind='stable')[:k]
+                # Every city closer than radius cells is in the searched square
+                if covers_all or lengths[nearest[-1]] <= radius * cell_size:
+                    neighbours[i] = np.asarray(candidates)[nearest]
+                    break
+            radius += 1
+    return neighbours
+
+
+def local_search(tour, coordinates, neighbours, or_opt=True, deadline=None, active=None):
+    """
+    Improve the tour with 2-opt and Or-opt moves until a local optimum is reached or time.time() > deadline.
+    If active cities are given, the search starts from them only (the tour is supposed to be a local optimum
+    around the other ones), and spreads to the cities whose edges change, then to all of them if a move was made.
+    Return the improved tour as a new array.
+    """
+    n = len(tour)
+    if n < 5:
+        return np.array(tour, dtype=np.intp)
+    xs = coordinates[:, 0].tolist()
+    ys = coordinates[:, 1].tolist()
+    near = neighbours.tolist()
+    order = [int(c) for c in tour]
+    pos = [0] * n
+    for i, c in enumerate(order):
+        pos[c] = i
+
+    def dist(a, b):
+        return math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+    def succ(c):
+        return order[pos[c] + 1 if pos[c] + 1 < n else 0]
+
+    def pred(c):
+        return order[pos[c] - 1]
+
+    def reverse(a, b):
+        # Reverse the path from a to b (following the tour), or the rest of the tour if it is shorter
+        i, j = pos[a], pos[b]
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j = j + 1 if j + 1 < n else 0, i - 1 if i > 0 else n - 1
+            length = n - length
+        for k in range(0, length // 2):
+            ci, cj = order[i], order[j]
+            order[i], order[j] = cj, ci
+            pos[cj], pos[ci] = i, j
+            i = i + 1 if i + 1 < n else 0
+            j = j - 1 if j > 0 else n - 1
+
+    def make_2opt(a, b, c, d):
+        # Replace the edges (a, b) and (c, d) by (a, c) and (b, d), b and d following a and c in the same direction
+        if succ(a) == b:
+            reverse(b, c)
+        else:
+            reverse(a, d)
+
+    if active is None:
+        active = deque(order)
+        queued = [True] * n
+    else:
+        active = deque(int(c) for c in active)
+        queued = [False] * n
+        for c in active:
+            queued[c] = True
+
+    def activate(*cities):
+        for c in cities:
+            if not queued[c]:
+                queued[c] = True
+                active.append(c)
+
+    # A move was made since all the cities were last activated
+    moved = False
+    while active or moved:
+        if not active:
+            moved = False
+            activate(*order)
+        if deadline is not None and time.time() > deadline:
+            break
+        a = active.popleft()
+        queued[a] = False
+        improved = False
+
+        # 2-opt: connect a to one of its neighbours c, for both edges of a
+        for forward in (True, False):
+            b = succ(a) if forward else pred(a)
+            d_ab = dist(a, b)
+            for c in near[a]:
+                d_ac = dist(a, c)
+                if d_ac >= d_ab:
+                    break
+                d = succ(c) if forward else pred(c)
+                if c == b or d == a:
+                    continue
+                if d_ac + dist(b, d) - d_ab - dist(c, d) < -1e-9:
+                    make_2opt(a, b, c, d)
+                    activate(a, b, c, d)
+                    improved = moved = True
+                    break
+            if improved:
+                break
+        if improved or not or_opt or n < 8:
+            if improved:
+                activate(a)
+            continue
+
+        # Or-opt: move the segment starting at a between two neighbouring cities, in either direction
+        for length in range(1, or_opt_max_length + 1):
+            segment = [a]
+            for k in range(1, length):
+                segment.append(succ(segment[-1]))
+            s1, s2 = a, segment[-1]
+            p, nx = pred(s1), succ(s2)
+            removed = dist(p, s1) + dist(s2, nx) - dist(p, nx)
+            for c in near[s1] + near[s2]:
+                if c in segment:
+                    continue
+                for u, v in ((c, succ(c)), (pred(c), c)):
+                    if u in segment or v in segment or p in (u, v):
+                        continue
+                    d_uv = dist(u, v)
+                    if dist(u, s1) + dist(s2, v) - d_uv - removed < -1e-9:
+                        x, y = u, v
+                    elif dist(u, s2) + dist(s1, v) - d_uv - removed < -1e-9:
+                        x, y = v, u
+                    else:
+                        continue
+                    # x must be connected to s1 and y to s2; c is the first city of the target edge in the tour
+                    c, e = (u, v) if succ(u) == v else (v, u)
+                    make_2opt(p, s1, c, e)
+                    make_2opt(p, c, nx, s2)
+                    if x == c:
+                        make_2opt(c, s2, s1, e)
+                    activate(p, nx, s1, s2, u, v)
+                    improved = moved = True
+                    break
+                if improved:
+                    break
+            if improved:
+                break
+
+    return np.array(order, dtype=np.intp)
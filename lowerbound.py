@@ -0,0 +1,216 @@
+"""
+    Lower bound of the length of the tours: the Held-Karp bound.
+
+    A 1-tree is a spanning tree of all the cities but the first one, plus two edges from the first city. Every tour is
+    a 1-tree, so the shortest 1-tree is not longer than the shortest tour. With penalties pi on the cities (distances
+    d_ij + pi_i + pi_j), every tour is longer by 2 sum(pi) but the shortest 1-tree changes: the bound is the length of
+    the shortest penalized 1-tree minus 2 sum(pi), increased by subgradient ascent (the penalty of a city grows with
+    its degree above 2 in the 1-tree).
+
+    The ascent only uses the edges from each city to its nearest neighbours (the candidate graph), so that each 1-tree
+    is a Kruskal on O(n k) edges. As such a 1-tree can be longer than the shortest one on all the edges, the bound is
+    then computed with the best penalties by Prim on all the edges (O(n^2) time, O(n) memory), which is done up to
+    exact_tree_max_cities cities.
+
+    Bounding computes the bound in another process (a thread in a daemonic process) while the solver runs.
+"""
+import multiprocessing
+import queue
+import threading
+
+import numpy as np
+
+import construction
+import localsearch
+
+# Iterations of the subgradient ascent
+ascent_iterations = 200
+# Above this quantity of cities, no bound is computed (the last 1-tree on all the edges is too slow)
+exact_tree_max_cities = 20000
+
+
+def candidate_edges(neighbours):
+    """
+    Return the two arrays of ends of the edges between the cities and their neighbours, each edge once
+    """
+    n, k = neighbours.shape
+    a = np.repeat(np.arange(n), k)
+    b = neighbours.ravel()
+    low, high = np.minimum(a, b), np.maximum(a, b)
+    keys = np.unique(low.astype(np.int64) * n + high)
+    return (keys // n).astype(np.intp), (keys % n).astype(np.intp)
+
+
+def candidate_one_tree(first_edges, others, pi):
+    """
+    Return the length and the degrees of the shortest penalized 1-tree made of candidate edges,
+    or None if the candidate edges don't connect the cities.
+    first_edges are the ends and lengths of the edges from the first city, others the same for the other edges.
+    """
+    n = len(pi)
+    degrees = np.zeros(n, dtype=np.intp)
+    ends, lengths = first_edges
+    if len(ends) < 2:
+        return None
+    penalized = lengths + pi[ends]
+    two = np.argsort(penalized)[:2]
+    length = float(penalized[two].sum()) + 2 * pi[0]
+    degrees[ends[two]] += 1
+    degrees[0] = 2
+
+    a, b, lengths = others
+    penalized = lengths + pi[a] + pi[b]
+    parent = list(range(n))
+
+    def root(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    joined = 0
+    for e in np.argsort(penalized).tolist():
+        ra, rb = root(int(a[e])), root(int(b[e]))
+        if ra != rb:
+            parent[ra] = rb
+            length += float(penalized[e])
+            degrees[a[e]] += 1
+            degrees[b[e]] += 1
+            joined += 1
+            if joined == n - 2:
+                return length, degrees
+    return None
+
+
+def one_tree(coordinates, pi):
+    """
+    Return the length and the degrees of the shortest penalized 1-tree on all the edges
+    """
+    n = len(coordinates)
+    degrees = np.zeros(n, dtype=np.intp)
+
+    def penalized_row(i):
+        delta = coordinates - coordinates[i]
+        return np.sqrt((delta * delta).sum(axis=1)) + pi + pi[i]
+
+    # Prim from the second city, the connections of the cities in the tree being infinite
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[:2] = True
+    connection = penalized_row(1)
+    connection[in_tree] = np.inf
+    parent = np.ones(n, dtype=np.intp)
+    length = 0.0
+    for k in range(2, n):
+        i = int(np.argmin(connection))
+        length += float(connection[i])
+        degrees[i] += 1
+        degrees[parent[i]] += 1
+        in_tree[i] = True
+        connection[i] = np.inf
+        row = penalized_row(i)
+        row[in_tree] = np.inf
+        closer = row < connection
+        connection[closer] = row[closer]
+        parent[closer] = i
+    first = penalized_row(0)
+    first[0] = np.inf
+    two = np.argpartition(first, 1)[:2]
+    length += float(first[two].sum())
+    degrees[two] += 1
+    degrees[0] = 2
+    return length, degrees
+
+
+def held_karp_bound(coordinates, neighbours, upper, iterations=ascent_iterations, stopped=None):
+    """
+    Return the Held-Karp lower bound of the tours of the cities, from the length of a known tour (upper),
+    or None if there are more than exact_tree_max_cities cities or if the stopped event is set
+    """
+    n = len(coordinates)
+    if n > exact_tree_max_cities:
+        return None
+    if n <= 3:
+        return upper
+    a, b = candidate_edges(neighbours)
+    lengths = np.sqrt(((coordinates[a] - coordinates[b]) ** 2).sum(axis=1))
+    from_first = (a == 0) | (b == 0)
+    first_edges = (np.where(a == 0, b, a)[from_first], lengths[from_first])
+    others = (a[~from_first], b[~from_first], lengths[~from_first])
+
+    pi = np.zeros(n)
+    best_pi, best_bound = pi, -np.inf
+    step = 2.0
+    for iteration in range(0, iterations):
+        if stopped is not None and stopped.is_set():
+            return None
+        tree = candidate_one_tree(first_edges, others, pi)
+        if tree is None:
+            # The ascent continues on all the edges
+            tree = one_tree(coordinates, pi)
+        length, degrees = tree
+        bound = length - 2 * pi.sum()
+        if bound > best_bound:
+            best_pi, best_bound = pi.copy(), bound
+        gradient = degrees - 2
+        if not gradient.any():
+            break
+        pi = pi + step * max(upper - bound, upper / 1000) / (gradient * gradient).sum() * gradient
+        step *= 0.95
+    if stopped is not None and stopped.is_set():
+        return None
+    length, degrees = one_tree(coordinates, best_pi)
+    return min(length - 2 * best_pi.sum(), upper)
+
+
+def bound_worker(coordinates, neighbours, results, stopped):
+    """
+    Compute the bound, from the tour of the local search as upper bound, and put it in the results
+    """
+    rng = np.random.default_rng(0)
+    tour = localsearch.local_search(construction.nearest_neighbour_tour(coordinates, rng), coordinates, neighbours)
+    delta = coordinates[tour] - coordinates[np.roll(tour, -1)]
+    results.put(held_karp_bound(coordinates, neighbours, float(np.sqrt((delta * delta).sum(axis=1)).sum()),
+                                stopped=stopped))
+
+
+class Bounding:
+    """
+    Computation of the lower bound of the instance alongside the solver
+    """
+
+    def __init__(self, coordinates, neighbours):
+        self.bound = None
+        # Daemonic processes (like the PVC-tester ones) can't have children
+        if multiprocessing.current_process().daemon:
+            self.results, self.stopped = queue.Queue(), threading.Event()
+            self.worker = threading.Thread(target=bound_worker, daemon=True,
+                                           args=(coordinates, neighbours, self.results, self.stopped))
+        else:
+            self.results, self.stopped = multiprocessing.Queue(), multiprocessing.Event()
+            self.worker = multiprocessing.Process(target=bound_worker, daemon=True,
+                                                  args=(coordinates, neighbours, self.results, self.stopped))
+        self.worker.start()
+
+    def poll(self):
+        """
+        Return the bound, or None while it is computed (or if there is none)
+        """
+        if self.bound is None and self.worker is not None:
+            try:
+                self.bound = self.results.get_nowait()
+                self.worker = None
+            except queue.Empty:
+                pass
+        return self.bound
+
+    def stop(self):
+        """
+        Stop the computation if it still runs
+        """
+        self.poll()
+        if self.worker is not None:
+            self.stopped.set()
+            if isinstance(self.worker, multiprocessing.Process):
+                self.worker.terminate()
+                self.worker.join()
+            self.worker = None
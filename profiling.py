@@ -0,0 +1,95 @@
+"""
+    Instrumentation of the genetic algorithm.
+
+    When enabled, it records:
+    - per stage of a generation (sort, selection, crossover...): wall time, CPU time and number of calls
+    - counters (distance evaluations, crossovers, successful and failed 2-opt tries, removed duplicates...)
+    - the convergence trace: best and mean total distance of the population at each generation
+    When disabled (the default), stage() returns a shared context manager doing nothing, and the solver
+    checks enabled before counting, so the cost is a few attribute lookups per generation.
+"""
+import collections
+import contextlib
+import csv
+import json
+import time
+
+enabled = False
+# Stage name -> [wall seconds, CPU seconds, calls]
+timers = {}
+counters = collections.Counter()
+# (generation, best distance, mean distance, elapsed seconds)
+trace = []
+
+_disabled_stage = contextlib.nullcontext()
+_start = time.perf_counter()
+
+
+def reset():
+    """
+    Forget all the recorded data
+    """
+    global _start
+    timers.clear()
+    counters.clear()
+    trace.clear()
+    _start = time.perf_counter()
+
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    def __exit__(self, *exc):
+        timer = timers.setdefault(self.name, [0.0, 0.0, 0])
+        timer[0] += time.perf_counter() - self.wall
+        timer[1] += time.process_time() - self.cpu
+        timer[2] += 1
+
+
+def stage(name):
+    """
+    Return a context manager timing the stage with the given name
+    """
+    return _Stage(name) if enabled else _disabled_stage
+
+
+def count(name, quantity=1):
+    """
+    Add the quantity to the counter with the given name
+    """
+    counters[name] += quantity
+
+
+def record_generation(generation, best, mean):
+    """
+    Add a generation to the convergence trace
+    """
+    trace.append((generation, best, mean, time.perf_counter() - _start))
+
+
+def report():
+    """
+    Return all the recorded data as a dictionary
+    """
+    return {'stages': {name: {'wall': t[0], 'cpu': t[1], 'calls': t[2]} for name, t in timers.items()},
+            'counters': dict(counters),
+            'trace': [{'generation': g, 'best': b, 'mean': m, 'elapsed': e} for g, b, m, e in trace]}
+
+
+def export(filename):
+    """
+    Write the recorded data to the file: all of it as JSON if its name ends with .json,
+    otherwise the convergence trace as CSV
+    """
+    with open(filename, 'w', newline='') as f:
+        if filename.endswith('.json'):
+            json.dump(report(), f, indent=2)
+        else:
+            writer = csv.writer(f)
+            writer.writerow(['generation', 'best', 'mean', 'elapsed'])
+            writer.writerows(trace)
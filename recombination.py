@@ -0,0 +1,193 @@
+"""
+    Edge-based crossovers for the travelling salesman problem, which keep the edges of the parents
+    rather than the positions of their cities.
+
+    - edge_recombination (ERX): the child is built city by city, going to the neighbour (in either parent) of the
+      current city having the fewest neighbours left, or to the nearest unvisited city when there is none.
+    - edge_assembly (EAX): the edges of both parents which are not common form AB-cycles, alternating between
+      an edge of the first parent (A) and an edge of the second one (B). A child is the first parent where the
+      A-edges of one AB-cycle are replaced by its B-edges. This gives subtours, which are merged two by two,
+      smallest first, by the cheapest exchange of two edges between a subtour and a near city of another one.
+
+    Tours are lists of cities. The distances are computed from the lists of coordinates xs and ys, and near holds
+    the list of nearest neighbours of each city. Each child is built in O(n), plus the merges of the subtours.
+"""
+import math
+
+
+def edges(tour):
+    """
+    Return the two neighbours of each city in the tour
+    """
+    n = len(tour)
+    adjacency = [None] * n
+    for i, c in enumerate(tour):
+        adjacency[c] = [tour[i - 1], tour[i + 1 if i + 1 < n else 0]]
+    return adjacency
+
+
+def tour_from_edges(adjacency):
+    """
+    Return the tour following the edges from the first city, if they form a single cycle
+    """
+    tour = [0]
+    previous, current = adjacency[0][0], 0
+    for i in range(1, len(adjacency)):
+        a, b = adjacency[current]
+        previous, current = current, b if a == previous else a
+        tour.append(current)
+    return tour
+
+
+def edge_recombination(parent1, parent2, xs, ys, near, rand):
+    """
+    Return the child of the edge recombination of the two parents
+    """
+    n = len(parent1)
+    adjacency = [set(e) for e in edges(parent1)]
+    for c, e in enumerate(edges(parent2)):
+        adjacency[c].update(e)
+    # Unvisited cities, removed by swapping with the last one
+    unvisited = list(range(n))
+    index = list(range(n))
+
+    def visit(c):
+        last = unvisited.pop()
+        if last != c:
+            unvisited[index[c]] = last
+            index[last] = index[c]
+        index[c] = -1
+        for v in adjacency[c]:
+            adjacency[v].discard(c)
+
+    current = parent1[rand.randrange(n)]
+    child = [current]
+    visit(current)
+    for step in range(1, n):
+        candidates = adjacency[current]
+        if candidates:
+            fewest = min(len(adjacency[v]) for v in candidates)
+            choices = [v for v in candidates if len(adjacency[v]) == fewest]
+            following = choices[rand.randrange(len(choices))] if len(choices) > 1 else choices[0]
+        else:
+            following = next((v for v in near[current] if index[v] >= 0), -1)
+            if following < 0:
+                following = unvisited[rand.randrange(len(unvisited))]
+        visit(following)
+        child.append(following)
+        current = following
+    return child
+
+
+def ab_cycles(parent1, parent2, rand):
+    """
+    Return the AB-cycles of the two parents, as lists of cities [c0, c1, ..., c2k-1]
+    where (c0, c1) is an edge of parent1, (c1, c2) an edge of parent2, ... and (c2k-1, c0) an edge of parent2
+    """
+    a_edges = edges(parent1)
+    b_edges = edges(parent2)
+    # Common edges are not in any AB-cycle
+    for c in range(0, len(parent1)):
+        for v in list(a_edges[c]):
+            if v in b_edges[c]:
+                a_edges[c].remove(v)
+                b_edges[c].remove(v)
+
+    cycles = []
+    for start in parent1:
+        if not a_edges[start]:
+            continue
+        # Walk from the start alternating A-edges and B-edges, the edge leaving the city at position i of the path
+        # being an A-edge if i is even. When the walk comes back to a city of the path at a position of the same
+        # parity, the edges walked since then form an AB-cycle, which is removed from the path.
+        path = [start]
+        positions = {(start, 0): 0}
+        while True:
+            current = path[-1]
+            parity = (len(path) - 1) % 2
+            choices = b_edges[current] if parity else a_edges[current]
+            if not choices:
+                break
+            following = choices[rand.randrange(len(choices))] if len(choices) > 1 else choices[0]
+            choices.remove(following)
+            (b_edges if parity else a_edges)[following].remove(current)
+            path.append(following)
+            k = len(path) - 1
+            j = positions.get((following, k % 2))
+            if j is None:
+                positions[(following, k % 2)] = k
+                continue
+            # Start the cycle with an A-edge
+            cycles.append(path[j:k] if j % 2 == 0 else path[j + 1:k] + [path[j]])
+            for i in range(j + 1, k):
+                del positions[(path[i], i % 2)]
+            del path[j + 1:]
+    return cycles
+
+
+def edge_assembly(parent1, cycle, xs, ys, near):
+    """
+    Return the child of the first parent where the A-edges of the AB-cycle are replaced by its B-edges,
+    the subtours being merged
+    """
+    n = len(parent1)
+    adjacency = edges(parent1)
+    for i in range(0, len(cycle), 2):
+        a, b = cycle[i], cycle[i + 1]
+        adjacency[a].remove(b)
+        adjacency[b].remove(a)
+    for i in range(1, len(cycle), 2):
+        a, b = cycle[i], cycle[i + 1 if i + 1 < len(cycle) else 0]
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+
+    # Subtours, by label
+    label = [-1] * n
+    subtours = {}
+    for s in range(0, n):
+        if label[s] >= 0:
+            continue
+        members = [s]
+        label[s] = s
+        previous, current = s, adjacency[s][0]
+        while current != s:
+            members.append(current)
+            label[current] = s
+            a, b = adjacency[current]
+            previous, current = current, b if a == previous else a
+        subtours[s] = members
+
+    hypot = math.hypot
+    while len(subtours) > 1:
+        smallest = min(subtours, key=lambda k: len(subtours[k]))
+        members = subtours[smallest]
+        # Join the subtour to a near city v: replace the edges (u, u2) and (v, v2) by (u, v) and (u2, v2)
+        best = None
+        for u in members:
+            xu, yu = xs[u], ys[u]
+            candidates = [v for v in near[u] if label[v] != smallest]
+            if not candidates and best is None and u == members[-1]:
+                # No neighbour outside of the subtour: any city can be joined
+                candidates = [v for v in range(0, n) if label[v] != smallest]
+            for v in candidates:
+                xv, yv = xs[v], ys[v]
+                d_uv = hypot(xu - xv, yu - yv)
+                for u2 in adjacency[u]:
+                    gain = hypot(xu - xs[u2], yu - ys[u2]) - d_uv
+                    for v2 in adjacency[v]:
+                        cost = hypot(xs[u2] - xs[v2], ys[u2] - ys[v2]) - hypot(xv - xs[v2], yv - ys[v2]) - gain
+                        if best is None or cost < best[0]:
+                            best = (cost, u, u2, v, v2)
+        # Replace the edges (u, u2) and (x, y) by (u, x) and (u2, y)
+        cost, u, u2, x, y = best
+        adjacency[u][adjacency[u].index(u2)] = x
+        adjacency[u2][adjacency[u2].index(u)] = y
+        adjacency[x][adjacency[x].index(y)] = u
+        adjacency[y][adjacency[y].index(x)] = u2
+        merged = label[x]
+        for c in members:
+            label[c] = merged
+        subtours[merged].extend(members)
+        del subtours[smallest]
+
+    return tour_from_edges(adjacency)
@@ -0,0 +1,167 @@
+"""
+    Persistent cache of the best tours found, for instances solved again.
+
+    An entry is a .npz file named after the quantity of cities and a hash of the coordinates sorted
+    lexicographically, so that the same cities given in another order share the entry. It holds the sorted
+    coordinates, the best tour as indexes in that order, its length and the time budget which found it (0 for a run
+    until stagnation). The directory is bounded to max_size bytes by removing the least recently used entries
+    (their modification time is updated when they are used).
+
+    An instance with a few cities added or removed (near_miss_changes) reuses the entry of the nearest one:
+    the removed cities are skipped in its tour, and the added cities are inserted where they lengthen it the least.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+import construction
+
+# Maximal size of the cache directory in bytes
+max_size = 100 * 1024 * 1024
+# Maximal quantity of added and removed cities for an entry to be reused, in share of the quantity of cities
+near_miss_changes = 5 / 100
+# Suffix of the entry files
+entry_suffix = '.npz'
+
+
+class Entry:
+    """
+    Best tour cached for an instance: as city indexes of the instance, its length, the time budget
+    which found it (0 for a run until stagnation), and the quantity of cities added or removed (0 for an exact hit)
+    """
+
+    def __init__(self, tour, length, maxtime, changes):
+        self.tour = tour
+        self.length = length
+        self.maxtime = maxtime
+        self.changes = changes
+
+    def covers(self, maxtime):
+        """
+        Return true if the entry is exact and was found with a budget at least as big as maxtime
+        """
+        return self.changes == 0 and (self.maxtime == 0 or (maxtime != 0 and self.maxtime >= maxtime))
+
+
+def canonical(coordinates):
+    """
+    Return the order sorting the coordinates lexicographically, and the hash of the sorted coordinates
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    order = np.lexsort((coordinates[:, 1], coordinates[:, 0]))
+    return order, hashlib.sha1(np.ascontiguousarray(coordinates[order]).tobytes()).hexdigest()
+
+
+def entry_file(directory, n, key):
+    """
+    Return the name of the entry file of the instance of n cities with the given hash
+    """
+    return os.path.join(directory, '%d-%s%s' % (n, key, entry_suffix))
+
+
+def lookup(directory, coordinates, neighbours):
+    """
+    Return the Entry of the instance, or the Entry of the nearest instance repaired for it, or None
+    """
+    if not os.path.isdir(directory):
+        return None
+    n = len(coordinates)
+    order, key = canonical(coordinates)
+    filename = entry_file(directory, n, key)
+    if os.path.exists(filename):
+        with np.load(filename) as data:
+            entry = Entry(order[data['tour'].astype(np.intp)], float(data['length']), float(data['maxtime']), 0)
+        os.utime(filename)
+        return entry
+
+    limit = int(n * near_miss_changes)
+    best = None
+    for name in os.listdir(directory):
+        if not name.endswith(entry_suffix) or '-' not in name:
+            continue
+        cached_n = int(name.split('-', 1)[0])
+        if limit == 0 or abs(cached_n - n) > limit:
+            continue
+        with np.load(os.path.join(directory, name)) as data:
+            cached_coordinates = data['coordinates']
+            kept, added = matching_cities(coordinates, cached_coordinates)
+            changes = int((kept < 0).sum()) + len(added)
+            if changes <= limit and (best is None or changes < best[0]):
+                best = (changes, name, kept[data['tour'].astype(np.intp)], added, float(data['maxtime']))
+    if best is None:
+        return None
+    changes, name, tour, added, maxtime = best
+    os.utime(os.path.join(directory, name))
+    tour = construction.cheapest_insertion(coordinates, neighbours, tour[tour >= 0], added)
+    delta = coordinates[tour] - coordinates[np.roll(tour, -1)]
+    return Entry(tour, float(np.sqrt((delta * delta).sum(axis=1)).sum()), maxtime, changes)
+
+
+def matching_cities(coordinates, cached_coordinates):
+    """
+    Match the cities of a cached instance with the cities at the same coordinates.
+    Return the index of each cached city in coordinates (-1 if it was removed) and the indexes of the added cities
+    """
+    positions = {}
+    for i, xy in enumerate(map(tuple, coordinates.tolist())):
+        positions.setdefault(xy, []).append(i)
+    kept = np.full(len(cached_coordinates), -1, dtype=np.intp)
+    for i, xy in enumerate(map(tuple, cached_coordinates.tolist())):
+        if positions.get(xy):
+            kept[i] = positions[xy].pop()
+    matched = np.zeros(len(coordinates), dtype=bool)
+    matched[kept[kept >= 0]] = True
+    return kept, np.flatnonzero(~matched)
+
+
+def store(directory, coordinates, tour, length, maxtime):
+    """
+    Save the tour of the instance found with the time budget maxtime (0 for a run until stagnation),
+    or keep the cached tour if it is not longer (with the biggest of both budgets),
+    then remove the least recently used entries beyond max_size
+    """
+    os.makedirs(directory, exist_ok=True)
+    order, key = canonical(coordinates)
+    filename = entry_file(directory, len(coordinates), key)
+    if os.path.exists(filename):
+        with np.load(filename) as data:
+            cached_tour, cached_length = order[data['tour'].astype(np.intp)], float(data['length'])
+            cached_maxtime = float(data['maxtime'])
+        maxtime = 0 if maxtime == 0 or cached_maxtime == 0 else max(maxtime, cached_maxtime)
+        if cached_length <= length:
+            tour, length = cached_tour, cached_length
+    # Position of each city in the sorted order
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    dtype = np.min_scalar_type(max(len(coordinates) - 1, 0))
+    temporary = '%s.%d.tmp' % (filename, os.getpid())
+    with open(temporary, 'wb') as f:
+        np.savez(f, coordinates=np.asarray(coordinates, dtype=np.float64)[order], tour=rank[tour].astype(dtype),
+                 length=np.float64(length), maxtime=np.float64(maxtime))
+    os.replace(temporary, filename)
+    evict(directory)
+
+
+def evict(directory):
+    """
+    Remove the least recently used entries until the directory holds at most max_size bytes
+    """
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(entry_suffix):
+            try:
+                status = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, status.st_size, name))
+    entries.sort()
+    size = sum(e[1] for e in entries)
+    for mtime, entry_size, name in entries[:-1]:
+        if size <= max_size:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        size -= entry_size
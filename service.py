@@ -0,0 +1,225 @@
+"""
+    Batch solving service: jobs are read as JSON lines, solved on a pool of processes started once, and their results
+    are written as JSON lines as soon as they are found (so not in the order of the jobs).
+
+    A job is an object with:
+    - "id": given back with the result (the line number of the job by default)
+    - "coordinates": list of [x, y] of the cities, or "file": name of a file of cities (see instances.load)
+    - "maxtime": time budget of the solver in seconds (0 or absent to stop when the solutions stagnate)
+    - "deadline": seconds after the job is received by which its result is due: the time spent waiting for a process
+      is taken from its budget, and if there is no result at the deadline, a TimeoutError is sent instead (a job
+      still waiting then is not solved, and a result found later is dropped)
+    - "seed": seed of the random generators
+    - "target_gap": stop once the tour is within this share of the lower bound (see PerezVaucher.ga_solve)
+
+    A result is an object with the "id" of the job, the "tour" as indexes of its cities, its "length", its "gap" to
+    the lower bound (null if it isn't computed), the "elapsed" seconds of the solve and the "error" (null if solved).
+
+    The jobs are read from the standard input and their results written to the standard output, or with --socket,
+    from the connections to a Unix socket, each connection getting the results of its own jobs.
+
+    Usage: service.py [-j PROCESSES] [--socket PATH] [--report-gap]
+"""
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import socketserver
+import sys
+import threading
+import time
+
+import numpy as np
+
+import instances
+import PerezVaucher
+
+# Compute the lower bound of the jobs without target gap too, for the gap of their results
+report_gap = False
+# Seconds before the deadline of a job kept to send its result
+deadline_margin = 0.05
+
+
+def init_worker(gap):
+    """
+    Set up a process of the pool
+    """
+    PerezVaucher.compute_lower_bound = gap
+
+
+def solve_job(job, received):
+    """
+    Solve the job received at the given time, and return its result
+    """
+    result = {'id': job.get('id'), 'tour': None, 'length': None, 'gap': None, 'elapsed': None, 'error': None}
+    try:
+        maxtime = float(job.get('maxtime') or 0)
+        if job.get('deadline') is not None:
+            left = received + float(job['deadline']) - deadline_margin - time.time()
+            if left <= 0:
+                raise TimeoutError('the deadline passed before the job was started')
+            maxtime = min(maxtime, left) if maxtime else left
+        if 'coordinates' in job:
+            coordinates = np.asarray(job['coordinates'], dtype=np.float64).reshape(-1, 2)
+            instance = instances.Instance(np.arange(len(coordinates)).astype(str), coordinates)
+        else:
+            instance = instances.load(job['file'])
+        if len(instance) == 0:
+            raise ValueError('no cities')
+        start = time.time()
+        best = None
+        for best in PerezVaucher.solve_iter(instance, False, maxtime, seed=job.get('seed'),
+                                            target_gap=job.get('target_gap')):
+            pass
+        result.update(tour=[int(instance.index[name]) for name in best.tour], length=best.length, gap=best.gap,
+                      elapsed=time.time() - start)
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+    return result
+
+
+class Dispatcher:
+    """
+    Jobs of one source: they are submitted to the pool, and their results written with write(text)
+    as they are found, or at their deadline
+    """
+
+    def __init__(self, pool, write):
+        self.pool = pool
+        self.write = write
+        self.pending = 0
+        self.finished = threading.Condition()
+        # Timeout result of each pending job, by job number
+        self.timeouts = {}
+        # Heap of the (deadline, job number) of the jobs with a deadline, and the thread watching it while it isn't
+        # empty
+        self.deadlines = []
+        self.watcher = None
+
+    def submit(self, line, number):
+        """
+        Submit the job of the line (its id being number if it has none)
+        """
+        received = time.time()
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError('a job must be a JSON object')
+        except ValueError as e:
+            self.send({'id': number, 'error': 'ValueError: %s' % e})
+            return
+        job.setdefault('id', number)
+        deadline = None
+        try:
+            if job.get('deadline') is not None:
+                deadline = received + float(job['deadline'])
+        except (TypeError, ValueError):
+            # The job fails in solve_job
+            pass
+        with self.finished:
+            self.pending += 1
+            self.timeouts[number] = {'id': job['id'], 'error': 'TimeoutError: the deadline passed'}
+            if deadline is not None:
+                heapq.heappush(self.deadlines, (deadline, number))
+                if self.watcher is None:
+                    self.watcher = threading.Thread(target=self.watch, daemon=True)
+                    self.watcher.start()
+                self.finished.notify_all()
+        self.pool.apply_async(solve_job, (job, received), callback=lambda result: self.finish(number, result),
+                              error_callback=lambda e: self.finish(number, {'id': job['id'], 'error': '%r' % e}))
+
+    def finish(self, number, result):
+        """
+        Send the result of the job of the given number, from the pool or at its deadline: the first one only
+        """
+        with self.finished:
+            if self.timeouts.pop(number, None) is None:
+                return
+            self.send(result)
+            self.pending -= 1
+            self.finished.notify_all()
+
+    def watch(self):
+        """
+        Send the timeout result of each pending job whose deadline passes, until there is no deadline left
+        """
+        with self.finished:
+            while self.deadlines:
+                deadline, number = self.deadlines[0]
+                left = deadline - time.time()
+                if left > 0:
+                    self.finished.wait(left)
+                    continue
+                heapq.heappop(self.deadlines)
+                if number in self.timeouts:
+                    self.finish(number, self.timeouts[number])
+            self.watcher = None
+
+    def send(self, result):
+        # The results are sent from the thread of the pool: a closed output must not stop it
+        try:
+            with self.finished:
+                self.write(json.dumps(result) + '\n')
+        except (OSError, ValueError):
+            pass
+
+    def wait(self):
+        """
+        Wait until the results of all the jobs are sent
+        """
+        with self.finished:
+            while self.pending:
+                self.finished.wait()
+
+
+def serve(pool, lines, write):
+    """
+    Solve the jobs of the lines, and write their results
+    """
+    dispatcher = Dispatcher(pool, write)
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            dispatcher.submit(line, number)
+    dispatcher.wait()
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """
+    Connection to the socket: its jobs are solved on the pool of the server
+    """
+
+    def handle(self):
+        def write(text):
+            self.wfile.write(text.encode('utf-8'))
+
+        serve(self.server.pool, (line.decode('utf-8') for line in self.rfile), write)
+
+
+def write_stdout(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Service de résolution par lots du voyageur de commerce')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='number of processes (default: one per processor)')
+    parser.add_argument('--socket', default=None, help='Unix socket receiving the jobs, instead of the standard input')
+    parser.add_argument('--report-gap', action='store_true', default=report_gap,
+                        help='compute the lower bound of every job, for the gap of its result')
+    args = parser.parse_args()
+
+    with multiprocessing.Pool(args.jobs or None, initializer=init_worker, initargs=(args.report_gap,)) as pool:
+        if args.socket is None:
+            serve(pool, sys.stdin, write_stdout)
+        else:
+            if os.path.exists(args.socket):
+                os.remove(args.socket)
+            with socketserver.ThreadingUnixStreamServer(args.socket, JobHandler) as server:
+                server.pool = pool
+                try:
+                    server.serve_forever()
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    os.remove(args.socket)
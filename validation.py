@@ -0,0 +1,101 @@
+"""
+    Validation of travelling salesman tours, in linear time.
+
+    A tour is valid if it visits every city of the instance exactly once, and its total distance
+    (including the return to the first city) matches the announced length up to a relative tolerance.
+
+    Usage: validation.py <instance> <tour> [--length <length>]
+    where <tour> is a file with the names of the cities in the order of the tour, separated by spaces or new lines.
+"""
+import sys
+
+import numpy as np
+
+import instances
+
+# Relative tolerance between the announced length and the length computed by the validation
+length_tolerance = 1e-6
+# Maximal quantity of cities quoted in an error message
+quoted_cities = 5
+
+
+def tour_length(coordinates, tour):
+    """
+    Return the total distance of the tour of city indexes, including the return to the first city
+    """
+    delta = coordinates[tour] - coordinates[np.roll(tour, -1)]
+    return float(np.sqrt((delta * delta).sum(axis=1)).sum())
+
+
+def validate_tour(coordinates, tour, length=None, name=None):
+    """
+    Validate the tour given as an array of city indexes. Cities are quoted by name(index) if given.
+    Return an empty string if it's valid, an error message otherwise
+    """
+    n = len(coordinates)
+    tour = np.asarray(tour, dtype=np.intp)
+    outside = tour[(tour < 0) | (tour >= n)]
+    if len(outside):
+        return "City %s does not exist! " % quote(outside)
+    seen = np.bincount(tour, minlength=n)
+    error = ""
+    if (seen > 1).any():
+        error += "City %s appears twice! " % quote(np.flatnonzero(seen > 1), name)
+    if (seen == 0).any():
+        error += "Not all cities visited! %s " % quote(np.flatnonzero(seen == 0), name)
+    if error:
+        return error
+    if length is not None:
+        total = tour_length(coordinates, tour)
+        if abs(total - length) > length_tolerance * max(abs(total), 1.0):
+            error += "Wrong dist! (%f instead of %f)" % (length, total)
+    return error
+
+
+def validate_path(instance, length, path):
+    """
+    Validate the tour given as a list of city names, for the already loaded instance.
+    Return an empty string if it's valid, an error message otherwise
+    """
+    unknown = [name for name in path if name not in instance.index]
+    if unknown:
+        return "City %s does not exist! " % quote(unknown)
+    return validate_tour(instance.coordinates, [instance.index[name] for name in path], length, instance.name)
+
+
+def quote(cities, name=None):
+    """
+    Return the first cities of the list (or their names) for an error message
+    """
+    cities = [str(c) if name is None else name(c) for c in cities]
+    more = " and %d more" % (len(cities) - quoted_cities) if len(cities) > quoted_cities else ""
+    return ", ".join(cities[:quoted_cities]) + more
+
+
+def validate(filename, length, path, instance=None):
+    """
+    Validate the tour given as a list of city names for the instance of the file, or the given already loaded one.
+    Return an empty string if it's valid, an error message otherwise
+    """
+    if instance is None:
+        try:
+            instance = instances.load(filename)
+        except Exception:
+            return "(Validation failed...)"
+    return validate_path(instance, length, path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Validation of a tour of the travelling salesman problem')
+    parser.add_argument('instance')
+    parser.add_argument('tour', help='file with the names of the cities in the order of the tour')
+    parser.add_argument('--length', type=float, default=None, help='announced total distance of the tour')
+
+    args = parser.parse_args()
+    with open(args.tour, 'r') as f:
+        path = f.read().split()
+    error = validate(args.instance, args.length, path)
+    print(error or "OK")
+    sys.exit(1 if error else 0)